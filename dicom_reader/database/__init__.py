@@ -4,7 +4,7 @@ Handles local DICOM database storage and retrieval
 """
 
 from .db_manager import DatabaseManager
-from .models import Base, Patient, Study, Series, Instance
+from .models import Base, Patient, Study, Series, Instance, InstanceView
 
 __all__ = [
     'DatabaseManager',
@@ -12,5 +12,6 @@ __all__ = [
     'Patient',
     'Study',
     'Series',
-    'Instance'
+    'Instance',
+    'InstanceView'
 ]
@@ -4,17 +4,126 @@ Handles all database operations for DICOM files
 """
 
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from typing import List, Optional
+import threading
+from dataclasses import dataclass, field
+from sqlalchemy import Connection, create_engine, event, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import sessionmaker, Session, undefer
+from queue import Queue
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 import logging
 import pydicom
 
-from .models import Base, Patient, Study, Series, Instance
+from .models import Base, Patient, Study, Series, Instance, InstanceView
+from ..dicom.loader import DICOMLoader, PARALLEL_MIN_FILES, process_pool
 from ..dicom.parser import DICOMParser
 
 logger = logging.getLogger(__name__)
 
+# Rows per INSERT statement during bulk ingestion
+BULK_BATCH_SIZE = 1000
+
+# Parsed records buffered between the parser pool and the writer thread
+INGEST_QUEUE_SIZE = 2048
+
+# Queued after the last record to stop the writer thread
+_END_OF_RECORDS = object()
+
+# Applied to every new SQLite connection of a file-backed database
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "cache_size=-1048576",  # 1 GiB
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "foreign_keys=ON"
+)
+
+
+# Full-text indexes of the searched columns: table -> (key column, indexed columns)
+FTS_TABLES = {
+    'patients': ('patient_id', ('patient_name', 'patient_id')),
+    'studies': ('study_instance_uid', ('study_description', 'accession_number'))
+}
+
+
+def _fts_columns(key: str, columns: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Columns stored in an FTS table: the indexed ones plus the row key"""
+    return columns if key in columns else columns + (key,)
+
+
+def _fts_ddl(table: str, key: str, columns: Tuple[str, ...]) -> List[str]:
+    """
+    Build the FTS5 table and sync triggers for a table
+
+    The tables have no stable rowid to use as external content, so the FTS
+    table keeps its own copy of the columns and is joined on the key.
+    """
+    stored = _fts_columns(key, columns)
+    definition = ', '.join(c if c in columns else f'{c} UNINDEXED' for c in stored)
+    cols = ', '.join(stored)
+    new_values = ', '.join(f'new.{c}' for c in stored)
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({definition})",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}({cols}) VALUES ({new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM {fts} WHERE {key} = old.{key}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {', '.join(columns)} ON {table} BEGIN "
+        f"DELETE FROM {fts} WHERE {key} = old.{key}; "
+        f"INSERT INTO {fts}({cols}) VALUES ({new_values}); END"
+    ]
+
+
+# Foreign keys of tables created with integer 'id' primary keys:
+# table -> (old integer column, parent table, parent key, new column)
+_LEGACY_FOREIGN_KEYS = {
+    'studies': ('patient_id', 'patients', 'patient_id', 'patient_id'),
+    'series': ('study_id', 'studies', 'study_instance_uid', 'study_instance_uid'),
+    'instances': ('series_id', 'series', 'series_instance_uid', 'series_instance_uid')
+}
+
+
+def _fts_query(search_term: str) -> str:
+    """Quote a user search term as an FTS5 phrase-prefix query"""
+    return '"' + search_term.replace('"', '""') + '"*'
+
+
+def _like_pattern(search_term: str) -> str:
+    """
+    Build a LIKE pattern for a user search term
+
+    Terms are matched by prefix so the NOCASE indexes can be used; a leading
+    '%' typed by the user still asks for a substring match.
+    """
+    return f'{search_term}%'
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configure a freshly opened SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+def _parse_dicom_record(file_path: str) -> Optional[Tuple[str, Dict]]:
+    """
+    Parse the header of a DICOM file into a database record (picklable for worker processes)
+
+    Args:
+        file_path: Path to the DICOM file
+
+    Returns:
+        (file_path, metadata) tuple or None if the file could not be read
+    """
+    dataset = DICOMLoader.load_metadata(file_path)
+    if dataset is None:
+        return None
+    return file_path, DICOMParser.get_all_metadata_fast(dataset)
+
 
 class DatabaseManager:
     """Manages the DICOM database"""
@@ -34,109 +143,238 @@ class DatabaseManager:
             db_path = os.path.join(db_dir, "dicom_database.db")
 
         self.db_path = db_path
-        self.engine = create_engine(f'sqlite:///{db_path}')
+        self.engine = create_engine(
+            f'sqlite:///{db_path}',
+            connect_args={'check_same_thread': False, 'timeout': 30}
+        )
+        if db_path != ':memory:':
+            event.listen(self.engine, 'connect', _set_sqlite_pragmas)
         self.Session = sessionmaker(bind=self.engine)
 
+        self._migrate_legacy_schema()
+
         # Create tables if they don't exist
         Base.metadata.create_all(self.engine)
 
+        # create_all() skips the indexes of tables that already exist, so
+        # databases created by older versions get new indexes here
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
+
+        self.fts_enabled = self._create_fts_tables()
+
         logger.info(f"Database initialized at: {db_path}")
 
     def get_session(self) -> Session:
         """Get a new database session"""
         return self.Session()
 
-    def add_dicom_file(self, file_path: str, dataset: pydicom.Dataset = None) -> bool:
+    def _migrate_legacy_schema(self):
+        """
+        Rebuild tables created by older versions
+
+        Tables with integer 'id' primary keys or without SQL-side timestamp
+        defaults are rebuilt. Rows are copied into the new tables, with
+        foreign keys translated from parent ids to parent UIDs where needed.
+        The old FTS tables are dropped and recreated (and repopulated) by
+        _create_fts_tables.
+        """
+        # pysqlite does not open transactions for DDL; take explicit control
+        # so the rebuild is applied entirely or not at all
+        with self.engine.execution_options(isolation_level='AUTOCOMMIT').connect() as conn:
+            if not self._is_legacy_schema(conn):
+                return
+
+            logger.info("Migrating database to the current schema")
+
+            conn.exec_driver_sql("BEGIN")
+            try:
+                self._rebuild_legacy_tables(conn)
+                conn.exec_driver_sql("COMMIT")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _is_legacy_schema(conn: Connection) -> bool:
+        """Whether existing tables predate natural keys or timestamp defaults"""
+        columns = {
+            row[1]: row[4] for row in conn.execute(text("PRAGMA table_info(patients)"))
+        }
+        if not columns:  # new database
+            return False
+        return 'id' in columns or columns.get('created_at') is None
+
+    @staticmethod
+    def _rebuild_legacy_tables(conn: Connection):
+        """
+        Replace the legacy tables with current tables holding the same rows
+
+        Args:
+            conn: Connection inside an open transaction
+        """
+        legacy_columns = {
+            table.name: [row[1] for row in conn.execute(text(f"PRAGMA table_info({table.name})"))]
+            for table in Base.metadata.sorted_tables
+        }
+
+        for table in FTS_TABLES:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}_fts"))
+
+        # Every trigger must be gone before the first rename, which
+        # re-validates the triggers of all tables
+        for table in Base.metadata.sorted_tables:
+            objects = conn.execute(text(
+                "SELECT type, name FROM sqlite_master "
+                "WHERE type IN ('index', 'trigger') AND tbl_name = :table AND sql IS NOT NULL"
+            ), {'table': table.name}).all()
+            for object_type, name in objects:
+                conn.execute(text(f"DROP {object_type.upper()} {name}"))
+
+        for table in Base.metadata.sorted_tables:
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO _legacy_{table.name}"))
+
+        Base.metadata.create_all(conn)
+
+        for table in Base.metadata.sorted_tables:
+            fk = _LEGACY_FOREIGN_KEYS.get(table.name) if 'id' in legacy_columns[table.name] else None
+            columns = [
+                c.name for c in table.columns
+                if c.name in legacy_columns[table.name] and (fk is None or c.name != fk[3])
+            ]
+            source_columns = ', '.join(f't.{c}' for c in columns)
+
+            if fk is None:
+                conn.execute(text(
+                    f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                    f"SELECT {source_columns} FROM _legacy_{table.name} t"
+                ))
+            else:
+                old_column, parent, parent_key, new_column = fk
+                conn.execute(text(
+                    f"INSERT INTO {table.name} ({', '.join(columns)}, {new_column}) "
+                    f"SELECT {source_columns}, p.{parent_key} FROM _legacy_{table.name} t "
+                    f"JOIN _legacy_{parent} p ON t.{old_column} = p.id"
+                ))
+
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(text(f"DROP TABLE _legacy_{table.name}"))
+
+    def _create_fts_tables(self) -> bool:
+        """
+        Create the FTS5 search tables and their sync triggers
+
+        Returns:
+            True if full-text search is available, False if this SQLite
+            build lacks FTS5 (searches then fall back to LIKE)
+        """
+        try:
+            with self.engine.begin() as conn:
+                for table, (key, columns) in FTS_TABLES.items():
+                    fts = f'{table}_fts'
+                    exists = conn.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {'name': fts}
+                    ).first()
+
+                    for statement in _fts_ddl(table, key, columns):
+                        conn.execute(text(statement))
+
+                    # Index rows written before the FTS table existed
+                    if not exists:
+                        cols = ', '.join(_fts_columns(key, columns))
+                        conn.execute(text(f"INSERT INTO {fts}({cols}) SELECT {cols} FROM {table}"))
+            return True
+
+        except OperationalError as e:
+            logger.warning(f"Full-text search unavailable, using LIKE: {str(e)}")
+            return False
+
+    @dataclass
+    class IngestContext:
+        """Keys of parent rows already written during one ingest run"""
+        patients: Set[str] = field(default_factory=set)
+        studies: Set[str] = field(default_factory=set)
+        series: Set[str] = field(default_factory=set)
+
+        def clear(self):
+            """Forget all cached keys (e.g. after a rollback)"""
+            self.patients.clear()
+            self.studies.clear()
+            self.series.clear()
+
+    def add_dicom_file(self, file_path: str, dataset: pydicom.Dataset = None,
+                       ctx: Optional['DatabaseManager.IngestContext'] = None) -> bool:
         """
         Add a DICOM file to the database
 
         Args:
             file_path: Path to the DICOM file
             dataset: Pre-loaded pydicom.Dataset (optional)
+            ctx: IngestContext shared across calls so that files of an
+                 already-seen patient/study/series skip the parent inserts
 
         Returns:
             True if successful
         """
+        if ctx is None:
+            ctx = self.IngestContext()
+
         session = self.get_session()
 
         try:
             # Load dataset if not provided
             if dataset is None:
-                dataset = pydicom.dcmread(file_path)
+                dataset = pydicom.dcmread(file_path, stop_before_pixels=True, defer_size="1 KB")
 
             # Extract metadata
-            patient_info = DICOMParser.get_patient_info(dataset)
-            study_info = DICOMParser.get_study_info(dataset)
-            series_info = DICOMParser.get_series_info(dataset)
-            instance_info = DICOMParser.get_instance_info(dataset)
-            image_info = DICOMParser.get_image_info(dataset)
-
-            # Get or create patient
-            patient = session.query(Patient).filter_by(
-                patient_id=patient_info['patient_id']
-            ).first()
-
-            if not patient:
-                patient = Patient(
+            metadata = DICOMParser.get_all_metadata_fast(dataset)
+            patient_info = metadata['patient']
+            study_info = metadata['study']
+            series_info = metadata['series']
+            instance_info = metadata['instance']
+            image_info = metadata['image']
+
+            # Create patient, study and series unless already present
+            if patient_info['patient_id'] not in ctx.patients:
+                session.execute(sqlite_insert(Patient).values(
                     patient_id=patient_info['patient_id'],
                     patient_name=patient_info['patient_name'],
                     patient_sex=patient_info['patient_sex'],
                     patient_birth_date=patient_info['patient_birth_date'],
                     patient_age=patient_info['patient_age']
-                )
-                session.add(patient)
-                session.flush()
+                ).on_conflict_do_nothing())
+                ctx.patients.add(patient_info['patient_id'])
 
-            # Get or create study
-            study = session.query(Study).filter_by(
-                study_instance_uid=study_info['study_instance_uid']
-            ).first()
-
-            if not study:
-                study = Study(
+            if study_info['study_instance_uid'] not in ctx.studies:
+                session.execute(sqlite_insert(Study).values(
                     study_instance_uid=study_info['study_instance_uid'],
-                    patient_id=patient.id,
+                    patient_id=patient_info['patient_id'],
                     study_date=study_info['study_date'],
                     study_time=study_info['study_time'],
                     study_description=study_info['study_description'],
                     accession_number=study_info['accession_number']
-                )
-                session.add(study)
-                session.flush()
-
-            # Get or create series
-            series = session.query(Series).filter_by(
-                series_instance_uid=series_info['series_instance_uid']
-            ).first()
+                ).on_conflict_do_nothing())
+                ctx.studies.add(study_info['study_instance_uid'])
 
-            if not series:
-                series = Series(
+            if series_info['series_instance_uid'] not in ctx.series:
+                session.execute(sqlite_insert(Series).values(
                     series_instance_uid=series_info['series_instance_uid'],
-                    study_id=study.id,
+                    study_instance_uid=study_info['study_instance_uid'],
                     series_number=series_info['series_number'],
                     series_description=series_info['series_description'],
                     modality=series_info['modality'],
                     series_date=series_info['series_date'],
                     series_time=series_info['series_time']
-                )
-                session.add(series)
-                session.flush()
-
-            # Check if instance already exists
-            existing_instance = session.query(Instance).filter_by(
-                sop_instance_uid=instance_info['sop_instance_uid']
-            ).first()
-
-            if existing_instance:
-                # Update file path if different
-                if existing_instance.file_path != file_path:
-                    existing_instance.file_path = file_path
-                    logger.info(f"Updated instance path: {instance_info['sop_instance_uid']}")
-            else:
-                # Create new instance
-                instance = Instance(
+                ).on_conflict_do_nothing())
+                ctx.series.add(series_info['series_instance_uid'])
+
+            # Create instance, or update its file path if it already exists elsewhere
+            added = session.execute(
+                sqlite_insert(Instance).values(
                     sop_instance_uid=instance_info['sop_instance_uid'],
-                    series_id=series.id,
+                    series_instance_uid=series_info['series_instance_uid'],
                     instance_number=instance_info['instance_number'],
                     acquisition_number=instance_info['acquisition_number'],
                     file_path=file_path,
@@ -144,15 +382,28 @@ class DatabaseManager:
                     columns=image_info['columns'],
                     slice_location=image_info['slice_location'],
                     slice_thickness=image_info['slice_thickness']
-                )
-                session.add(instance)
+                ).on_conflict_do_nothing().returning(Instance.sop_instance_uid)
+            ).scalar()
+
+            if added is not None:
                 logger.info(f"Added instance: {instance_info['sop_instance_uid']}")
+            else:
+                result = session.execute(
+                    update(Instance)
+                    .where(Instance.sop_instance_uid == instance_info['sop_instance_uid'])
+                    .where(Instance.file_path != file_path)
+                    .values(file_path=file_path)
+                )
+                if result.rowcount:
+                    logger.info(f"Updated instance path: {instance_info['sop_instance_uid']}")
 
             session.commit()
             return True
 
         except Exception as e:
             session.rollback()
+            # Parents inserted in the rolled-back transaction are gone again
+            ctx.clear()
             logger.error(f"Error adding DICOM file to database: {str(e)}", exc_info=True)
             return False
 
@@ -163,23 +414,222 @@ class DatabaseManager:
         """
         Add multiple DICOM files to the database
 
+        Headers are parsed in a process pool while a writer thread inserts
+        the records already parsed, so parsing and writing overlap.
+
         Args:
             file_paths: List of paths to DICOM files
 
         Returns:
             Number of files successfully added
         """
-        count = 0
+        if len(file_paths) < PARALLEL_MIN_FILES:
+            records = [record for record in map(_parse_dicom_record, file_paths) if record is not None]
+            return self._insert_records(records, self.IngestContext())
+
+        with process_pool() as executor:
+            return self._insert_records_pipelined(
+                executor.map(_parse_dicom_record, file_paths, chunksize=64)
+            )
+
+    def _insert_records_pipelined(self, records: Iterable[Optional[Tuple[str, Dict]]]) -> int:
+        """
+        Write records from a producer on a dedicated writer thread
+
+        The calling thread consumes records (None entries are skipped) into
+        a bounded queue; the writer drains it and writes every
+        BULK_BATCH_SIZE records through _insert_records.
+
+        Args:
+            records: Iterable of (file_path, metadata) tuples or None
+
+        Returns:
+            Number of records written
+        """
+        queue = Queue(maxsize=INGEST_QUEUE_SIZE)
+        written = 0
+
+        def write_batches():
+            nonlocal written
+            ctx = self.IngestContext()
+            batch = []
+            while True:
+                item = queue.get()
+                if item is not _END_OF_RECORDS:
+                    batch.append(item)
+                if batch and (len(batch) >= BULK_BATCH_SIZE or item is _END_OF_RECORDS):
+                    written += self._insert_records(batch, ctx)
+                    batch = []
+                if item is _END_OF_RECORDS:
+                    return
+
+        writer = threading.Thread(target=write_batches, name='dicom-db-writer', daemon=True)
+        writer.start()
+        try:
+            for record in records:
+                if record is not None:
+                    queue.put(record)
+        finally:
+            queue.put(_END_OF_RECORDS)
+            writer.join()
+
+        return written
+
+    def bulk_add_dicom_files(self, file_paths: List[str]) -> int:
+        """
+        Add multiple DICOM files to the database using batched INSERTs
+
+        All files are parsed first, then patients, studies, series and
+        instances are inserted table by table in batches of
+        BULK_BATCH_SIZE rows, one transaction per batch.
+
+        Args:
+            file_paths: List of paths to DICOM files
+
+        Returns:
+            Number of files successfully added
+        """
+        records = []
         for file_path in file_paths:
-            if self.add_dicom_file(file_path):
-                count += 1
-        return count
+            record = _parse_dicom_record(file_path)
+            if record is not None:
+                records.append(record)
+
+        return self._insert_records(records, self.IngestContext())
+
+    def _insert_records(self, records: List[Tuple[str, Dict]],
+                        ctx: 'DatabaseManager.IngestContext') -> int:
+        """
+        Write parsed records on one connection, committing every BULK_BATCH_SIZE rows
+
+        Each commit costs a WAL sync, so batching bounds the number of syncs
+        while keeping the write lock short enough for readers and checkpoints.
+        If a batch fails, the batches committed before it are kept.
+
+        Args:
+            records: List of (file_path, metadata) tuples
+            ctx: IngestContext carrying parent keys across batches
+
+        Returns:
+            Number of records written
+        """
+        if not records:
+            return 0
+
+        written = 0
+        try:
+            with self.engine.connect() as conn:
+                for start in range(0, len(records), BULK_BATCH_SIZE):
+                    batch = records[start:start + BULK_BATCH_SIZE]
+                    self._bulk_insert_records(conn, batch, ctx)
+                    conn.commit()
+                    written += len(batch)
+
+            logger.info(f"Bulk added {written} DICOM files")
+            return written
+
+        except Exception as e:
+            ctx.clear()
+            logger.error(f"Error bulk adding DICOM files to database "
+                         f"({written} of {len(records)} written): {str(e)}", exc_info=True)
+            return written
+
+    def _bulk_insert_records(self, conn: Connection, records: List[Tuple[str, Dict]],
+                             ctx: 'DatabaseManager.IngestContext'):
+        """
+        Insert one batch of parsed records, one multi-row statement per table
+
+        Uses Core statements on the tables directly (no unit of work or
+        identity map). Foreign keys are the parent UIDs from the records
+        themselves, so no keys are read back; parents already in ctx are
+        not inserted again.
+
+        Args:
+            conn: Connection with an open transaction
+            records: List of (file_path, metadata) tuples from DICOMParser.get_all_metadata_fast
+            ctx: IngestContext updated with the keys of new parent rows
+        """
+        patients = {}
+        studies = {}
+        series = {}
+        instances = {}
+
+        for file_path, metadata in records:
+            patient_info = metadata['patient']
+            study_info = metadata['study']
+            series_info = metadata['series']
+            instance_info = metadata['instance']
+            image_info = metadata['image']
+
+            # Parents keep the attributes of the first file seen, as the
+            # OR IGNORE inserts do across batches
+            patient_id = patient_info['patient_id']
+            if patient_id not in ctx.patients and patient_id not in patients:
+                patients[patient_id] = {
+                    'patient_id': patient_info['patient_id'],
+                    'patient_name': patient_info['patient_name'],
+                    'patient_sex': patient_info['patient_sex'],
+                    'patient_birth_date': patient_info['patient_birth_date'],
+                    'patient_age': patient_info['patient_age']
+                }
+
+            study_uid = study_info['study_instance_uid']
+            if study_uid not in ctx.studies and study_uid not in studies:
+                studies[study_uid] = {
+                    'study_instance_uid': study_info['study_instance_uid'],
+                    'patient_id': patient_info['patient_id'],
+                    'study_date': study_info['study_date'],
+                    'study_time': study_info['study_time'],
+                    'study_description': study_info['study_description'],
+                    'accession_number': study_info['accession_number']
+                }
+
+            series_uid = series_info['series_instance_uid']
+            if series_uid not in ctx.series and series_uid not in series:
+                series[series_uid] = {
+                    'series_instance_uid': series_info['series_instance_uid'],
+                    'study_instance_uid': study_info['study_instance_uid'],
+                    'series_number': series_info['series_number'],
+                    'series_description': series_info['series_description'],
+                    'modality': series_info['modality'],
+                    'series_date': series_info['series_date'],
+                    'series_time': series_info['series_time']
+                }
+
+            instances[instance_info['sop_instance_uid']] = {
+                'sop_instance_uid': instance_info['sop_instance_uid'],
+                'series_instance_uid': series_info['series_instance_uid'],
+                'instance_number': instance_info['instance_number'],
+                'acquisition_number': instance_info['acquisition_number'],
+                'file_path': file_path,
+                'rows': image_info['rows'],
+                'columns': image_info['columns'],
+                'slice_location': image_info['slice_location'],
+                'slice_thickness': image_info['slice_thickness']
+            }
+
+        for table, rows, seen in ((Patient.__table__, patients, ctx.patients),
+                                  (Study.__table__, studies, ctx.studies),
+                                  (Series.__table__, series, ctx.series)):
+            if rows:
+                conn.execute(table.insert().prefix_with('OR IGNORE'), list(rows.values()))
+                seen.update(rows)
+
+        # An already-known instance only has its file path refreshed
+        instances_table = Instance.__table__
+        stmt = sqlite_insert(instances_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['sop_instance_uid'],
+            set_={'file_path': stmt.excluded.file_path, 'updated_at': stmt.excluded.updated_at},
+            where=instances_table.c.file_path != stmt.excluded.file_path
+        )
+        conn.execute(stmt, list(instances.values()))
 
     def get_all_patients(self) -> List[Patient]:
         """Get all patients from database"""
         session = self.get_session()
         try:
-            return session.query(Patient).all()
+            return session.query(Patient).options(undefer(Patient.patient_name)).all()
         finally:
             session.close()
 
@@ -187,10 +637,9 @@ class DatabaseManager:
         """Get all studies for a patient"""
         session = self.get_session()
         try:
-            patient = session.query(Patient).filter_by(patient_id=patient_id).first()
-            if patient:
-                return patient.studies
-            return []
+            return session.query(Study).filter(
+                Study.patient_id == patient_id
+            ).options(undefer(Study.study_description)).all()
         finally:
             session.close()
 
@@ -198,10 +647,9 @@ class DatabaseManager:
         """Get all series for a study"""
         session = self.get_session()
         try:
-            study = session.query(Study).filter_by(study_instance_uid=study_uid).first()
-            if study:
-                return study.series
-            return []
+            return session.query(Series).filter(
+                Series.study_instance_uid == study_uid
+            ).options(undefer(Series.series_description)).all()
         finally:
             session.close()
 
@@ -209,10 +657,37 @@ class DatabaseManager:
         """Get all instances for a series"""
         session = self.get_session()
         try:
-            series = session.query(Series).filter_by(series_instance_uid=series_uid).first()
-            if series:
-                return series.instances
-            return []
+            return session.query(Instance).filter(
+                Instance.series_instance_uid == series_uid
+            ).options(undefer(Instance.file_path)).order_by(Instance.instance_number).all()
+        finally:
+            session.close()
+
+    def list_series_instances_light(self, series_uid: str) -> List[InstanceView]:
+        """
+        Get the instances of a series as lightweight read-only rows
+
+        Intended for list views over large series, where full ORM objects
+        cost far more memory and attribute access time than the columns shown.
+
+        Args:
+            series_uid: Series Instance UID
+
+        Returns:
+            List of InstanceView tuples ordered by instance number
+        """
+        statement = select(
+            Instance.sop_instance_uid,
+            Instance.instance_number,
+            Instance.file_path,
+            Instance.slice_location
+        ).where(
+            Instance.series_instance_uid == series_uid
+        ).order_by(Instance.instance_number)
+
+        session = self.get_session()
+        try:
+            return [InstanceView(*row) for row in session.execute(statement)]
         finally:
             session.close()
 
@@ -220,6 +695,8 @@ class DatabaseManager:
         """
         Search patients by name or ID
 
+        With FTS5 available, words of the name/ID are matched by prefix.
+
         Args:
             search_term: Search term
 
@@ -228,9 +705,18 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            return session.query(Patient).filter(
-                (Patient.patient_name.like(f'%{search_term}%')) |
-                (Patient.patient_id.like(f'%{search_term}%'))
+            if self.fts_enabled and search_term.strip():
+                statement = select(Patient).from_statement(text(
+                    "SELECT patients.* FROM patients "
+                    "JOIN patients_fts ON patients.patient_id = patients_fts.patient_id "
+                    "WHERE patients_fts MATCH :q"
+                )).options(undefer(Patient.patient_name))
+                return session.execute(statement, {'q': _fts_query(search_term)}).scalars().all()
+
+            pattern = _like_pattern(search_term)
+            return session.query(Patient).options(undefer(Patient.patient_name)).filter(
+                (Patient.patient_name.like(pattern)) |
+                (Patient.patient_id.like(pattern))
             ).all()
         finally:
             session.close()
@@ -239,6 +725,9 @@ class DatabaseManager:
         """
         Search studies by description or accession number
 
+        With FTS5 available, words of the description/accession number are
+        matched by prefix.
+
         Args:
             search_term: Search term
 
@@ -247,9 +736,18 @@ class DatabaseManager:
         """
         session = self.get_session()
         try:
-            return session.query(Study).filter(
-                (Study.study_description.like(f'%{search_term}%')) |
-                (Study.accession_number.like(f'%{search_term}%'))
+            if self.fts_enabled and search_term.strip():
+                statement = select(Study).from_statement(text(
+                    "SELECT studies.* FROM studies "
+                    "JOIN studies_fts ON studies.study_instance_uid = studies_fts.study_instance_uid "
+                    "WHERE studies_fts MATCH :q"
+                )).options(undefer(Study.study_description))
+                return session.execute(statement, {'q': _fts_query(search_term)}).scalars().all()
+
+            pattern = _like_pattern(search_term)
+            return session.query(Study).options(undefer(Study.study_description)).filter(
+                (Study.study_description.like(pattern)) |
+                (Study.accession_number.like(pattern))
             ).all()
         finally:
             session.close()
@@ -3,26 +3,38 @@ Database Models
 SQLAlchemy models for DICOM database
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Index, DDL, event, func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from datetime import datetime
+from sqlalchemy.orm import relationship, deferred
+from collections import namedtuple
 
 Base = declarative_base()
 
 
+# Bulky text columns are deferred: listing and counting rows does not load
+# them, and queries that hand objects to callers undefer() what they need.
+
+# Timestamps are filled in by SQLite (CURRENT_TIMESTAMP, UTC): defaults on
+# insert and a trigger per table on update, see _touch_updated_at below.
+
+# Tables are keyed by their DICOM identifiers and stored WITHOUT ROWID, so
+# each table is a single b-tree ordered by its UID and foreign keys hold the
+# parent UID directly.
+
+
 class Patient(Base):
     """Patient information"""
     __tablename__ = 'patients'
+    __table_args__ = {'sqlite_with_rowid': False}
 
-    id = Column(Integer, primary_key=True)
-    patient_id = Column(String(64), unique=True, nullable=False, index=True)
-    patient_name = Column(String(256))
+    patient_id = Column(String(64), primary_key=True)
+    patient_name = deferred(Column(String(256, collation='NOCASE')))
     patient_sex = Column(String(16))
     patient_birth_date = Column(String(32))
     patient_age = Column(String(16))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+    updated_at = Column(DateTime, server_default=func.current_timestamp(),
+                        server_onupdate=func.current_timestamp())
 
     # Relationships
     studies = relationship("Study", back_populates="patient", cascade="all, delete-orphan")
@@ -31,19 +43,28 @@ class Patient(Base):
         return f"<Patient(id={self.patient_id}, name={self.patient_name})>"
 
 
+# Case-insensitive indexes for the searched columns, so a left-anchored LIKE
+# ('term%') is answered with an index range scan. The index carries its own
+# collation, which also covers databases created before the columns were
+# declared NOCASE and keeps the unique patient_id case-sensitive.
+Index('ix_patient_name_nocase', Patient.__table__.c.patient_name.collate('NOCASE'))
+Index('ix_patient_id_nocase', Patient.__table__.c.patient_id.collate('NOCASE'))
+
+
 class Study(Base):
     """Study information"""
     __tablename__ = 'studies'
+    __table_args__ = {'sqlite_with_rowid': False}
 
-    id = Column(Integer, primary_key=True)
-    study_instance_uid = Column(String(128), unique=True, nullable=False, index=True)
-    patient_id = Column(Integer, ForeignKey('patients.id'), nullable=False)
+    study_instance_uid = Column(String(128), primary_key=True)
+    patient_id = Column(String(64), ForeignKey('patients.patient_id'), nullable=False, index=True)
     study_date = Column(String(32))
     study_time = Column(String(32))
-    study_description = Column(Text)
-    accession_number = Column(String(64))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    study_description = deferred(Column(Text(collation='NOCASE')))
+    accession_number = Column(String(64, collation='NOCASE'))
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+    updated_at = Column(DateTime, server_default=func.current_timestamp(),
+                        server_onupdate=func.current_timestamp())
 
     # Relationships
     patient = relationship("Patient", back_populates="studies")
@@ -53,20 +74,26 @@ class Study(Base):
         return f"<Study(uid={self.study_instance_uid}, desc={self.study_description})>"
 
 
+Index('ix_study_description_nocase', Study.__table__.c.study_description.collate('NOCASE'))
+Index('ix_accession_number_nocase', Study.__table__.c.accession_number.collate('NOCASE'))
+
+
 class Series(Base):
     """Series information"""
     __tablename__ = 'series'
+    __table_args__ = {'sqlite_with_rowid': False}
 
-    id = Column(Integer, primary_key=True)
-    series_instance_uid = Column(String(128), unique=True, nullable=False, index=True)
-    study_id = Column(Integer, ForeignKey('studies.id'), nullable=False)
+    series_instance_uid = Column(String(128), primary_key=True)
+    study_instance_uid = Column(String(128), ForeignKey('studies.study_instance_uid'),
+                                nullable=False, index=True)
     series_number = Column(Integer)
-    series_description = Column(Text)
+    series_description = deferred(Column(Text))
     modality = Column(String(16))
     series_date = Column(String(32))
     series_time = Column(String(32))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+    updated_at = Column(DateTime, server_default=func.current_timestamp(),
+                        server_onupdate=func.current_timestamp())
 
     # Relationships
     study = relationship("Study", back_populates="series")
@@ -79,13 +106,18 @@ class Series(Base):
 class Instance(Base):
     """Instance (image) information"""
     __tablename__ = 'instances'
-
-    id = Column(Integer, primary_key=True)
-    sop_instance_uid = Column(String(128), unique=True, nullable=False, index=True)
-    series_id = Column(Integer, ForeignKey('series.id'), nullable=False)
+    __table_args__ = (
+        # Instances of a series in slice order with a single index walk;
+        # also serves plain series lookups as the leading column
+        Index('ix_inst_series_number', 'series_instance_uid', 'instance_number'),
+        {'sqlite_with_rowid': False}
+    )
+
+    sop_instance_uid = Column(String(128), primary_key=True)
+    series_instance_uid = Column(String(128), ForeignKey('series.series_instance_uid'), nullable=False)
     instance_number = Column(Integer)
     acquisition_number = Column(Integer)
-    file_path = Column(Text, nullable=False)
+    file_path = deferred(Column(Text, nullable=False))
 
     # Image information
     rows = Column(Integer)
@@ -93,11 +125,39 @@ class Instance(Base):
     slice_location = Column(Float)
     slice_thickness = Column(Float)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+    updated_at = Column(DateTime, server_default=func.current_timestamp(),
+                        server_onupdate=func.current_timestamp())
 
     # Relationships
     series = relationship("Series", back_populates="instances")
 
     def __repr__(self):
         return f"<Instance(uid={self.sop_instance_uid}, path={self.file_path})>"
+
+
+def _touch_updated_at(model):
+    """
+    Create an AFTER UPDATE trigger refreshing updated_at with the table
+
+    Statements that set updated_at themselves (e.g. the bulk upsert of
+    instances) are left alone, so each update writes the row only once.
+    """
+    table = model.__table__
+    key = table.primary_key.columns.values()[0].name
+    event.listen(table, 'after_create', DDL(
+        f"CREATE TRIGGER IF NOT EXISTS {table.name}_touch AFTER UPDATE ON {table.name} "
+        f"FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at BEGIN "
+        f"UPDATE {table.name} SET updated_at = CURRENT_TIMESTAMP WHERE {key} = NEW.{key}; END"
+    ))
+
+
+for _model in (Patient, Study, Series, Instance):
+    _touch_updated_at(_model)
+
+
+# Read-only projection of an instance row for list views; a plain tuple
+# avoids the per-object ORM identity and instrumentation overhead
+InstanceView = namedtuple('InstanceView', [
+    'sop_instance_uid', 'instance_number', 'file_path', 'slice_location'
+])
@@ -5,12 +5,13 @@ Handles DICOM file loading, parsing, and organization
 
 from .loader import DICOMLoader
 from .parser import DICOMParser
-from .series_organizer import SeriesOrganizer, DICOMStudy, DICOMSeries
+from .series_organizer import SeriesOrganizer, DICOMStudy, DICOMSeries, read_header_records
 
 __all__ = [
     'DICOMLoader',
     'DICOMParser',
     'SeriesOrganizer',
     'DICOMStudy',
-    'DICOMSeries'
+    'DICOMSeries',
+    'read_header_records'
 ]
@@ -0,0 +1,37 @@
+"""
+Pixel Data Codecs
+Decoder preferences for compressed pixel data (pylibjpeg is optional)
+"""
+
+import pydicom
+
+try:
+    # Importing pylibjpeg makes its installed codec plugins (pylibjpeg-openjpeg,
+    # pylibjpeg-libjpeg) available to pydicom
+    import pylibjpeg
+    PYLIBJPEG_AVAILABLE = True
+except ImportError:
+    PYLIBJPEG_AVAILABLE = False
+
+
+def _prefer_pylibjpeg():
+    """
+    Decode JPEG and JPEG 2000 with pylibjpeg ahead of Pillow
+
+    pydicom 3 already tries its pylibjpeg plugin before Pillow (and it is
+    the only one decoding HTJ2K). pydicom 2 uses the first handler of
+    config.pixel_data_handlers that supports a transfer syntax, with Pillow
+    listed first, so the pylibjpeg handler is moved in front of it.
+    """
+    if not PYLIBJPEG_AVAILABLE or int(pydicom.__version__.split('.')[0]) >= 3:
+        return
+
+    from pydicom.pixel_data_handlers import pillow_handler, pylibjpeg_handler
+
+    handlers = pydicom.config.pixel_data_handlers
+    if pylibjpeg_handler in handlers and pillow_handler in handlers:
+        handlers.remove(pylibjpeg_handler)
+        handlers.insert(handlers.index(pillow_handler), pylibjpeg_handler)
+
+
+_prefer_pylibjpeg()
@@ -0,0 +1,205 @@
+"""
+Header Scanner
+Minimal reader for the few header elements the series organizer needs
+"""
+
+import mmap
+import struct
+from typing import Dict, Optional
+
+from .parser import HEADER_TAGS
+
+_IMPLICIT_VR_LITTLE = '1.2.840.10008.1.2'
+
+# Deflated explicit VR little endian; data sets that are not plain little endian
+_DEFLATED = '1.2.840.10008.1.2.1.99'
+_BIG_ENDIAN_PREFIX = '1.2.840.10008.1.2.2'
+
+# Explicit VRs with a reserved field and a 32-bit length
+_LONG_VRS = frozenset((b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ',
+                       b'SV', b'UC', b'UN', b'UR', b'UT', b'UV'))
+
+# Specific Character Set -> Python codec; other character sets are left to pydicom
+_ENCODINGS = {'': 'latin-1', 'ISO_IR 6': 'latin-1', 'ISO_IR 100': 'latin-1', 'ISO_IR 192': 'utf-8'}
+
+_TRANSFER_SYNTAX = 0x00020010
+_CHARSET = 0x00080005
+_ITEM = 0xFFFEE000
+_ITEM_DELIMITER = 0xFFFEE00D
+_SEQUENCE_DELIMITER = 0xFFFEE0DD
+_UNDEFINED = 0xFFFFFFFF
+_LAST_TAG = max(HEADER_TAGS)
+
+_TAG = struct.Struct('<HH')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+
+
+class _Unsupported(Exception):
+    """The file needs the full pydicom reader"""
+
+
+class _Reader:
+    """Forward reader over a memory-mapped file; only touched pages are read"""
+
+    def __init__(self, buf: mmap.mmap, explicit: bool = True):
+        self.buf = buf
+        self.pos = 0
+        self.size = len(buf)
+        self.explicit = explicit
+
+    def take(self, n: int) -> bytes:
+        end = self.pos + n
+        if end > self.size:
+            raise _Unsupported()
+        data = self.buf[self.pos:end]
+        self.pos = end
+        return data
+
+    def skip(self, n: int):
+        """Move past a value without copying it"""
+        self.pos += n
+        if self.pos > self.size:
+            raise _Unsupported()
+
+    def peek_group(self) -> int:
+        if self.pos + 2 > self.size:
+            raise _Unsupported()
+        return _U16.unpack_from(self.buf, self.pos)[0]
+
+    def at_end(self) -> bool:
+        return self.pos >= self.size
+
+    def element(self):
+        """Read an element header; returns (tag, vr, length)"""
+        group, elem = _TAG.unpack(self.take(4))
+        tag = (group << 16) | elem
+
+        # Items and delimiters never carry a VR
+        if group == 0xFFFE or not self.explicit:
+            return tag, None, _U32.unpack(self.take(4))[0]
+
+        vr = self.take(2)
+        if vr in _LONG_VRS:
+            self.take(2)
+            return tag, vr, _U32.unpack(self.take(4))[0]
+        if not vr.isalpha():
+            raise _Unsupported()
+        return tag, vr, _U16.unpack(self.take(2))[0]
+
+    def skip_sequence(self):
+        """Skip the items of an undefined length sequence"""
+        while True:
+            tag, _, length = self.element()
+            if tag == _SEQUENCE_DELIMITER:
+                return
+            if tag != _ITEM:
+                raise _Unsupported()
+            if length == _UNDEFINED:
+                self.skip_item()
+            else:
+                self.skip(length)
+
+    def skip_item(self):
+        """Skip the elements of an undefined length item"""
+        while True:
+            tag, _, length = self.element()
+            if tag == _ITEM_DELIMITER:
+                return
+            if length == _UNDEFINED:
+                self.skip_sequence()
+            else:
+                self.skip(length)
+
+
+def _convert(text: str, cast, default):
+    """Convert an element value the way get_header_record does"""
+    if '\\' in text:
+        # Multi-valued; pydicom's formatting of those is kept
+        raise _Unsupported()
+    if not text:
+        return default
+    if cast is str:
+        return text
+    try:
+        return cast(text)
+    except ValueError:
+        raise _Unsupported()
+
+
+def scan_header(file_path: str) -> Optional[Dict]:
+    """
+    Read the HEADER_TAGS elements of a file without pydicom
+
+    Handles little endian files with a DICOM preamble and simple character
+    sets. The file is memory-mapped: values that are not needed are skipped
+    without being copied and reading stops at the last HEADER_TAGS element,
+    so only the pages holding the header are read (pixel data never is),
+    and those stay in the page cache for the viewer's full read.
+
+    Args:
+        file_path: Path to the DICOM file
+
+    Returns:
+        Header record as built by DICOMParser.get_header_record, or None if
+        the file is not a supported DICOM file (read it with pydicom then)
+    """
+    try:
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            reader = _Reader(buf)
+            if reader.take(132)[128:] != b'DICM':
+                return None
+
+            # File meta information is always explicit VR little endian
+            transfer_syntax = None
+            while reader.peek_group() == 0x0002:
+                tag, _, length = reader.element()
+                if tag == _TRANSFER_SYNTAX:
+                    transfer_syntax = reader.take(length).decode('ascii').rstrip('\x00 ')
+                else:
+                    reader.skip(length)
+
+            if transfer_syntax == _IMPLICIT_VR_LITTLE:
+                reader.explicit = False
+            elif (transfer_syntax is None or transfer_syntax == _DEFLATED
+                  or transfer_syntax.startswith(_BIG_ENDIAN_PREFIX)):
+                return None
+
+            encoding = 'latin-1'
+            values = {}
+            while len(values) < len(HEADER_TAGS) and not reader.at_end():
+                tag, _, length = reader.element()
+                if tag > _LAST_TAG:
+                    break
+
+                if length == _UNDEFINED:
+                    reader.skip_sequence()
+                elif tag == _CHARSET:
+                    charset = reader.take(length).decode('ascii').strip('\x00 ')
+                    if charset not in _ENCODINGS:
+                        return None
+                    encoding = _ENCODINGS[charset]
+                elif tag in HEADER_TAGS:
+                    values[tag] = reader.take(length)
+                else:
+                    reader.skip(length)
+
+    except (OSError, ValueError, struct.error, UnicodeDecodeError, _Unsupported):
+        # ValueError: empty files cannot be mapped
+        return None
+
+    record = {}
+    try:
+        for tag, (field, cast, default) in HEADER_TAGS.items():
+            value = values.get(tag)
+            if value is None:
+                record[field] = default
+                continue
+            text = value.decode(encoding).rstrip('\x00 ')
+            if cast is not str:
+                text = text.strip()
+            record[field] = _convert(text, cast, default)
+    except (UnicodeDecodeError, _Unsupported):
+        return None
+
+    return record
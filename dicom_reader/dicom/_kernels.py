@@ -0,0 +1,206 @@
+"""
+Compiled Kernels
+Numba-compiled pixel loops for the display hot path (numba is optional),
+and the lookup table fallback used without numba
+"""
+
+import numpy as np
+from functools import lru_cache
+from typing import Optional, Tuple
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    # The kernel runs on the viewer's render thread; the TBB layer hangs at
+    # interpreter exit once it has been started from a thread other than
+    # the main one, so prefer OpenMP when it is available
+    numba.config.THREADING_LAYER_PRIORITY = ['omp', 'tbb', 'workqueue']
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _window_level_flat(src, slope, intercept, lo, scale, out):
+        for i in numba.prange(src.shape[0]):
+            v = (src[i] * slope + intercept - lo) * scale
+            out[i] = np.uint8(min(max(v, 0.0), 255.0))
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _sample_plane(volume, origin, u, v, out):
+        depth, height, width = volume.shape
+        for i in numba.prange(out.shape[0]):
+            for j in range(out.shape[1]):
+                x = origin[0] + j * u[0] + i * v[0]
+                y = origin[1] + j * u[1] + i * v[1]
+                z = origin[2] + j * u[2] + i * v[2]
+                if x < 0 or y < 0 or z < 0 or x > width - 1 or y > height - 1 or z > depth - 1:
+                    out[i, j] = 0
+                    continue
+
+                x0 = int(x)
+                y0 = int(y)
+                z0 = int(z)
+                x1 = min(x0 + 1, width - 1)
+                y1 = min(y0 + 1, height - 1)
+                z1 = min(z0 + 1, depth - 1)
+                fx = x - x0
+                fy = y - y0
+                fz = z - z0
+
+                c00 = volume[z0, y0, x0] * (1 - fx) + volume[z0, y0, x1] * fx
+                c01 = volume[z0, y1, x0] * (1 - fx) + volume[z0, y1, x1] * fx
+                c10 = volume[z1, y0, x0] * (1 - fx) + volume[z1, y0, x1] * fx
+                c11 = volume[z1, y1, x0] * (1 - fx) + volume[z1, y1, x1] * fx
+                c0 = c00 * (1 - fy) + c01 * fy
+                c1 = c10 * (1 - fy) + c11 * fy
+                out[i, j] = c0 * (1 - fz) + c1 * fz
+
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _window_level_sampled(src, rows, columns, slope, intercept, lo, scale, out):
+        for y in numba.prange(rows.shape[0]):
+            row = src[rows[y]]
+            for x in range(columns.shape[0]):
+                v = (row[columns[x]] * slope + intercept - lo) * scale
+                out[y, x] = np.uint8(min(max(v, 0.0), 255.0))
+
+
+def window_level_int16(src: np.ndarray, slope: float, intercept: float,
+                       lo: float, scale: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Rescale, window and convert 16-bit stored pixel values to uint8 in one pass
+
+    Computes clip((src * slope + intercept - lo) * scale, 0, 255) without
+    float intermediates the size of the image. Requires numba.
+
+    Args:
+        src: C-contiguous int16/uint16 array of stored values (any shape)
+        slope: Rescale slope
+        intercept: Rescale intercept
+        lo: Lower edge of the window, in rescaled units
+        scale: Output levels per rescaled unit (255 / window width)
+        out: Optional C-contiguous uint8 array with the shape of src to
+             write into (allocated if None)
+
+    Returns:
+        uint8 array with the shape of src
+    """
+    if out is None:
+        out = np.empty(src.shape, dtype=np.uint8)
+    _window_level_flat(src.reshape(-1), float(slope), float(intercept),
+                       float(lo), float(scale), out.reshape(-1))
+    return out
+
+
+def sample_plane(volume: np.ndarray, origin: np.ndarray, u: np.ndarray, v: np.ndarray,
+                 out: np.ndarray) -> np.ndarray:
+    """
+    Sample a plane through a volume with trilinear interpolation
+
+    out[i, j] is the volume at origin + j * u + i * v, in (x, y, z) voxel
+    coordinates of a (z, y, x) volume; points outside the volume are 0.
+    Requires numba.
+
+    Args:
+        volume: (slices, rows, columns) array
+        origin: (x, y, z) position of out[0, 0]
+        u: (x, y, z) step between output columns
+        v: (x, y, z) step between output rows
+        out: 2-D array to write into
+
+    Returns:
+        out
+    """
+    _sample_plane(volume, np.asarray(origin, dtype=np.float64), np.asarray(u, dtype=np.float64),
+                  np.asarray(v, dtype=np.float64), out)
+    return out
+
+
+@lru_cache(maxsize=16)
+def nearest_indices(source: int, target: int) -> np.ndarray:
+    """
+    Source index of each of target samples along an axis of source pixels
+
+    Nearest neighbour sampling at the sample centers (like QImage.scaled
+    with Qt.FastTransformation, up to rounding).
+    """
+    indices = ((np.arange(target) + 0.5) * (source / target)).astype(np.intp)
+    np.minimum(indices, source - 1, out=indices)
+    indices.flags.writeable = False  # Shared between calls
+    return indices
+
+
+def window_level_resized16(src: np.ndarray, slope: float, intercept: float,
+                           lo: float, scale: float, shape: Tuple[int, int],
+                           out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Window 16-bit stored values and resize them (nearest neighbour) in one pass
+
+    Only the source pixels that land in the output are windowed, and no
+    full-size uint8 image is made before scaling.
+
+    Args:
+        src: 2-D int16/uint16 array of stored values
+        slope: Rescale slope
+        intercept: Rescale intercept
+        lo: Lower edge of the window, in rescaled units
+        scale: Output levels per rescaled unit (255 / window width)
+        shape: Output (rows, columns)
+        out: Optional C-contiguous uint8 array of that shape to write into
+
+    Returns:
+        uint8 array of the given shape
+    """
+    rows = nearest_indices(src.shape[0], shape[0])
+    columns = nearest_indices(src.shape[1], shape[1])
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+
+    if NUMBA_AVAILABLE:
+        _window_level_sampled(src, rows, columns, float(slope), float(intercept),
+                              float(lo), float(scale), out)
+        return out
+
+    lut = _window_lut(src.dtype == np.int16, float(slope), float(intercept), float(lo), float(scale))
+    return np.take(lut, src.view(np.uint16)[rows[:, None], columns], out=out)
+
+
+@lru_cache(maxsize=16)
+def _window_lut(signed: bool, slope: float, intercept: float, lo: float, scale: float) -> np.ndarray:
+    """Build the uint8 display value of every 16-bit stored value"""
+    stored = np.arange(65536, dtype=np.uint16)
+    values = (stored.view(np.int16) if signed else stored).astype(np.float64)
+    values *= slope
+    values += intercept - lo
+    values *= scale
+    np.clip(values, 0, 255, out=values)
+    lut = values.astype(np.uint8)
+    lut.flags.writeable = False  # Shared between calls
+    return lut
+
+
+def window_level_lut16(src: np.ndarray, slope: float, intercept: float,
+                       lo: float, scale: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Same as window_level_int16, as a table lookup (does not need numba)
+
+    A 16-bit image has at most 65536 distinct stored values, so the rescale
+    and window are computed once per value and each pixel becomes a single
+    byte gather. Tables are cached per window, so during cine only the
+    lookup runs.
+
+    Args:
+        src: int16/uint16 array of stored values (any shape)
+        slope: Rescale slope
+        intercept: Rescale intercept
+        lo: Lower edge of the window, in rescaled units
+        scale: Output levels per rescaled unit (255 / window width)
+        out: Optional uint8 array with the shape of src to write into
+
+    Returns:
+        uint8 array with the shape of src
+    """
+    lut = _window_lut(src.dtype == np.int16, float(slope), float(intercept), float(lo), float(scale))
+    return np.take(lut, src.view(np.uint16), out=out)
@@ -3,52 +3,268 @@ DICOM File Loader
 Handles loading and validation of DICOM files from various sources
 """
 
+import io
+import multiprocessing
 import os
 import pydicom
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Validation only needs the preamble/DICM check plus one element; restricting
+# the read to SOPClassUID skips value decoding for every other header element.
+_VALIDATION_TAGS = [0x00080016]
+
+# Below this many files a worker pool costs more to start than it saves
+PARALLEL_MIN_FILES = 64
+
+# Validation tasks queued at once while streaming a directory; bounds memory
+# and lets results flow back before the walk has finished
+MAX_IN_FLIGHT = 256
+
+# Default number of fully loaded datasets kept by DICOMLoader.load_file
+DEFAULT_MAX_CACHED = 256
+
+# Files timed by iter_files to tell parse-bound from I/O-bound loads
+PROBE_FILES = 8
+
+# Parse share of the probe time above which a load counts as parse-bound
+COMPUTE_BOUND_RATIO = 0.5
+
+# Threads overlapping file reads in I/O-bound loads
+IO_THREADS = 4
+
+# Files iter_files reads ahead of its consumer; full datasets (pixel data
+# included) are held until they are yielded
+READ_AHEAD = 32
+
+
+def process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Start a process pool for DICOM parsing
+
+    Workers are spawned, not forked: the parent can have threads running
+    (Qt, numba/OpenMP, the logging listener), and forking a process with
+    running threads is unsafe.
+
+    Args:
+        max_workers: Number of worker processes (os.cpu_count() if None)
+    """
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def _is_dicom_static(path_str: str) -> bool:
+    """
+    Check if a file is a valid DICOM file (picklable for worker processes)
+
+    Args:
+        path_str: Path to the file
+
+    Returns:
+        True if file is a valid DICOM file
+    """
+    try:
+        # Try to read the file header
+        pydicom.dcmread(path_str, stop_before_pixels=True, specific_tags=_VALIDATION_TAGS)
+        return True
+    except Exception:
+        return False
+
+
+def _read_dataset(file_path: str) -> Optional[pydicom.Dataset]:
+    """
+    Read a full DICOM file (picklable for worker processes)
+
+    Args:
+        file_path: Path to the DICOM file
+
+    Returns:
+        pydicom.Dataset object or None if reading fails
+    """
+    try:
+        return pydicom.dcmread(file_path)
+    except Exception as e:
+        logger.error(f"Error loading {file_path}: {str(e)}")
+        return None
+
+
+def _walk_files(directory: str, recursive: bool) -> Iterator[str]:
+    """
+    Yield the paths of the files under a directory as they are found
+
+    Args:
+        directory: Directory to walk
+        recursive: If True, descend into subdirectories (symlinks are not followed)
+
+    Yields:
+        File paths
+    """
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            yield from _walk_files(entry.path, recursive)
+                    elif entry.is_file():
+                        yield entry.path
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.warning(f"Cannot read directory {directory}: {str(e)}")
+
+
+def _validate_pooled(executor: Executor, paths: Iterator[str],
+                     progress_callback: Optional[Callable[[int, int], None]]) -> Iterator[str]:
+    """
+    Validate files in a pool, keeping at most MAX_IN_FLIGHT queued
+
+    Args:
+        executor: Pool to validate in
+        paths: Files to validate
+        progress_callback: Called as progress_callback(files_checked, dicom_found)
+
+    Yields:
+        Paths to valid DICOM files, in completion order
+    """
+    checked = 0
+    found = 0
+    pending = {}
+
+    try:
+        while True:
+            # Top the window up with newly walked files
+            for path in islice(paths, MAX_IN_FLIGHT - len(pending)):
+                pending[executor.submit(_is_dicom_static, path)] = path
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                checked += 1
+                if future.result():
+                    found += 1
+                    yield path
+                if progress_callback:
+                    progress_callback(checked, found)
+    finally:
+        # The caller stopped early (e.g. a cancelled load); drop queued files
+        for future in pending:
+            future.cancel()
+
 
 class DICOMLoader:
     """Loads DICOM files from directories or individual files"""
 
-    def __init__(self):
+    def __init__(self, use_processes: bool = True, max_cached: int = DEFAULT_MAX_CACHED):
+        """
+        Initialize the loader
+
+        Args:
+            use_processes: Validate files in a process pool. Set to False for
+                           slow network mounts, where threads overlap I/O waits
+                           without the process start-up cost.
+            max_cached: Maximum number of loaded datasets kept in the LRU cache
+        """
+        self.use_processes = use_processes
+        self.max_cached = max_cached
         self.dicom_files = []
-        self.loaded_datasets = []
 
-    def load_from_directory(self, directory_path: str, recursive: bool = True) -> List[str]:
+        # LRU cache of loaded datasets keyed by file path
+        self._cache: "OrderedDict[str, pydicom.Dataset]" = OrderedDict()
+
+        # Datasets still referenced elsewhere (e.g. by the viewer) stay
+        # reachable here after being evicted from the LRU cache
+        self._by_sop_uid: "weakref.WeakValueDictionary[str, pydicom.Dataset]" = weakref.WeakValueDictionary()
+
+        # Guards the caches; viewers prefetch datasets from worker threads
+        self._lock = threading.Lock()
+
+    def load_from_directory(self, directory_path: str, recursive: bool = True,
+                            progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
         """
         Load all DICOM files from a directory
 
         Args:
             directory_path: Path to the directory containing DICOM files
             recursive: If True, search subdirectories recursively
+            progress_callback: Called as progress_callback(files_checked, dicom_found)
 
         Returns:
             List of paths to valid DICOM files
         """
-        directory = Path(directory_path)
-
-        if not directory.exists():
+        if not os.path.isdir(directory_path):
             logger.error(f"Directory does not exist: {directory_path}")
             return []
 
-        pattern = "**/*" if recursive else "*"
-        dicom_files = []
-
-        for file_path in directory.glob(pattern):
-            if file_path.is_file() and self._is_dicom_file(file_path):
-                dicom_files.append(str(file_path))
+        dicom_files = list(self.iter_dicom_files(directory_path, recursive, progress_callback))
 
         self.dicom_files.extend(dicom_files)
         logger.info(f"Found {len(dicom_files)} DICOM files in {directory_path}")
 
         return dicom_files
 
+    def iter_dicom_files(self, directory_path: str, recursive: bool = True,
+                         progress_callback: Optional[Callable[[int, int], None]] = None,
+                         executor: Optional[Executor] = None) -> Iterator[str]:
+        """
+        Stream the valid DICOM files of a directory while it is being walked
+
+        Validation starts on the first file found instead of after the whole
+        tree has been listed. Large directories are validated in a worker pool
+        with at most MAX_IN_FLIGHT files queued, so files are yielded in
+        completion order rather than walk order.
+
+        Args:
+            directory_path: Path to the directory containing DICOM files
+            recursive: If True, search subdirectories recursively
+            progress_callback: Called as progress_callback(files_checked, dicom_found)
+                               after each file is validated
+            executor: Pool for large directories; if None, one is started
+                      for this call (see use_processes)
+
+        Yields:
+            Paths to valid DICOM files
+        """
+        paths = _walk_files(directory_path, recursive)
+        checked = 0
+        found = 0
+
+        # Small directories are validated in-process
+        head = list(islice(paths, PARALLEL_MIN_FILES))
+        if len(head) < PARALLEL_MIN_FILES:
+            for path in head:
+                checked += 1
+                if _is_dicom_static(path):
+                    found += 1
+                    yield path
+                if progress_callback:
+                    progress_callback(checked, found)
+            return
+
+        paths = chain(head, paths)
+        if executor is not None:
+            yield from _validate_pooled(executor, paths, progress_callback)
+            return
+
+        if self.use_processes:
+            own_executor = process_pool()
+        else:
+            own_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        with own_executor:
+            yield from _validate_pooled(own_executor, paths, progress_callback)
+
     def load_file(self, file_path: str) -> Optional[pydicom.Dataset]:
         """
         Load a single DICOM file
@@ -59,15 +275,177 @@ class DICOMLoader:
         Returns:
             pydicom.Dataset object or None if loading fails
         """
+        with self._lock:
+            cached = self._cache.get(file_path)
+            if cached is not None:
+                self._cache.move_to_end(file_path)
+                return cached
+
+        dataset = _read_dataset(file_path)
+        if dataset is not None:
+            self._remember(file_path, dataset)
+        return dataset
+
+    def _remember(self, file_path: str, dataset: pydicom.Dataset):
+        """Add a loaded dataset to the LRU cache and the SOP UID index"""
+        with self._lock:
+            self._cache[file_path] = dataset
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+            sop_uid = dataset.get('SOPInstanceUID')
+            if sop_uid:
+                self._by_sop_uid[sop_uid] = dataset
+
+        logger.info(f"Successfully loaded: {file_path}")
+
+    def read_full(self, file_path: str) -> Optional[pydicom.Dataset]:
+        """
+        Read the full dataset (with pixel data) of an organized instance
+
+        Series only keep header records and file paths; viewers call this
+        for the instances they actually display. Results share the LRU
+        cache of load_file.
+
+        Args:
+            file_path: Path to the DICOM file
+
+        Returns:
+            pydicom.Dataset object or None if loading fails
+        """
+        return self.load_file(file_path)
+
+    def release_pixel_arrays(self, keep: Iterable[str]) -> int:
+        """
+        Drop the decoded pixel arrays of cached datasets
+
+        The datasets stay cached with their (possibly compressed) PixelData,
+        so pixel_array decodes again on next access.
+
+        Args:
+            keep: Paths of the datasets whose decoded arrays are kept
+
+        Returns:
+            Number of arrays released
+        """
+        keep = set(keep)
+        released = 0
+        with self._lock:
+            for file_path, dataset in self._cache.items():
+                # pydicom keeps the decoded array here once pixel_array is read
+                if file_path not in keep and getattr(dataset, '_pixel_array', None) is not None:
+                    dataset._pixel_array = None
+                    released += 1
+        return released
+
+    def is_cached(self, file_path: str) -> bool:
+        """Check if the dataset of a file is in the LRU cache"""
+        with self._lock:
+            return file_path in self._cache
+
+    @staticmethod
+    def load_metadata(file_path: str) -> Optional[pydicom.Dataset]:
+        """
+        Load only the header of a DICOM file (no pixel data)
+
+        Args:
+            file_path: Path to the DICOM file
+
+        Returns:
+            Header-only pydicom.Dataset or None if loading fails
+        """
         try:
-            dataset = pydicom.dcmread(file_path)
-            self.loaded_datasets.append(dataset)
-            logger.info(f"Successfully loaded: {file_path}")
-            return dataset
+            return pydicom.dcmread(file_path, stop_before_pixels=True, defer_size="1 KB")
         except Exception as e:
-            logger.error(f"Error loading {file_path}: {str(e)}")
+            logger.error(f"Error loading metadata from {file_path}: {str(e)}")
             return None
 
+    def iter_files(self, file_paths: Iterable[str]) -> Iterator[pydicom.Dataset]:
+        """
+        Load DICOM files one at a time
+
+        Large loads time the first PROBE_FILES files, split into reading the
+        bytes and parsing them. If parsing dominates, the rest is loaded in a
+        process pool (threads would serialize on the GIL); otherwise
+        IO_THREADS threads overlap the reads. At most READ_AHEAD files are
+        read ahead of the consumer.
+
+        Args:
+            file_paths: Paths to DICOM files
+
+        Yields:
+            pydicom.Dataset objects in the order of file_paths; files that
+            fail to load are skipped
+        """
+        file_paths = list(file_paths)
+
+        if len(file_paths) < PARALLEL_MIN_FILES:
+            for file_path in file_paths:
+                dataset = self.load_file(file_path)
+                if dataset is not None:
+                    yield dataset
+            return
+
+        io_time = 0.0
+        parse_time = 0.0
+        for file_path in file_paths[:PROBE_FILES]:
+            if self.is_cached(file_path):
+                yield self.load_file(file_path)
+                continue
+
+            try:
+                start = time.perf_counter()
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+                read_done = time.perf_counter()
+                dataset = pydicom.dcmread(io.BytesIO(data))
+                parse_time += time.perf_counter() - read_done
+                io_time += read_done - start
+            except Exception as e:
+                logger.error(f"Error loading {file_path}: {str(e)}")
+                continue
+
+            dataset.filename = file_path
+            self._remember(file_path, dataset)
+            yield dataset
+
+        rest = file_paths[PROBE_FILES:]
+        total_time = io_time + parse_time
+        parse_ratio = parse_time / total_time if total_time else 0.0
+        compute_bound = parse_ratio > COMPUTE_BOUND_RATIO
+        logger.info(f"Loading {len(rest)} files: mode={'compute' if compute_bound else 'io'} "
+                    f"parse_ratio={parse_ratio:.2f}")
+
+        if compute_bound and self.use_processes:
+            executor = process_pool()
+        else:
+            executor = ThreadPoolExecutor(max_workers=IO_THREADS)
+
+        # Reads are submitted in file order, at most READ_AHEAD at a time
+        to_read = iter([file_path for file_path in rest if not self.is_cached(file_path)])
+        queued = deque()
+
+        try:
+            for file_path in rest:
+                for path in islice(to_read, READ_AHEAD - len(queued)):
+                    queued.append((path, executor.submit(_read_dataset, path)))
+
+                if queued and queued[0][0] == file_path:
+                    dataset = queued.popleft()[1].result()
+                    if dataset is not None:
+                        self._remember(file_path, dataset)
+                else:
+                    dataset = self.load_file(file_path)
+
+                if dataset is not None:
+                    yield dataset
+        finally:
+            # The caller may stop early; drop the reads not started yet
+            # instead of waiting for them
+            for _, future in queued:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     def load_files(self, file_paths: List[str]) -> List[pydicom.Dataset]:
         """
         Load multiple DICOM files
@@ -78,14 +456,7 @@ class DICOMLoader:
         Returns:
             List of pydicom.Dataset objects
         """
-        datasets = []
-
-        for file_path in file_paths:
-            dataset = self.load_file(file_path)
-            if dataset is not None:
-                datasets.append(dataset)
-
-        return datasets
+        return list(self.iter_files(file_paths))
 
     def _is_dicom_file(self, file_path: Path) -> bool:
         """
@@ -97,12 +468,19 @@ class DICOMLoader:
         Returns:
             True if file is a valid DICOM file
         """
-        try:
-            # Try to read the file header
-            pydicom.dcmread(file_path, stop_before_pixels=True)
-            return True
-        except:
-            return False
+        return _is_dicom_static(str(file_path))
+
+    def get_by_sop_uid(self, sop_instance_uid: str) -> Optional[pydicom.Dataset]:
+        """
+        Get a loaded dataset by SOP Instance UID
+
+        Args:
+            sop_instance_uid: SOP Instance UID of the dataset
+
+        Returns:
+            The dataset if it is cached or still referenced elsewhere, else None
+        """
+        return self._by_sop_uid.get(sop_instance_uid)
 
     def get_file_count(self) -> int:
         """Get the number of DICOM files found"""
@@ -111,4 +489,6 @@ class DICOMLoader:
     def clear(self):
         """Clear all loaded files and datasets"""
         self.dicom_files.clear()
-        self.loaded_datasets.clear()
+        with self._lock:
+            self._cache.clear()
+            self._by_sop_uid.clear()
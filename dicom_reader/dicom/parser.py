@@ -4,13 +4,162 @@ Extracts and processes metadata from DICOM files
 """
 
 import pydicom
+from pydicom.multival import MultiValue
 import numpy as np
 from typing import Dict, Optional, Tuple
 from datetime import datetime
 import logging
 
+from . import _codecs  # Sets the pixel data decoder preferences on import
+from ._kernels import (NUMBA_AVAILABLE, nearest_indices, window_level_int16,
+                       window_level_lut16, window_level_resized16)
+
 logger = logging.getLogger(__name__)
 
+# DICOM tag -> (section, field, coercer) for get_all_metadata_fast.
+# A coercer of None keeps the element value as returned by pydicom.
+_WANTED_TAGS = {
+    0x00100010: ('patient', 'patient_name', str),
+    0x00100020: ('patient', 'patient_id', str),
+    0x00100040: ('patient', 'patient_sex', str),
+    0x00100030: ('patient', 'patient_birth_date', str),
+    0x00101010: ('patient', 'patient_age', str),
+    0x0020000D: ('study', 'study_instance_uid', str),
+    0x00080020: ('study', 'study_date', str),
+    0x00080030: ('study', 'study_time', str),
+    0x00081030: ('study', 'study_description', str),
+    0x00080050: ('study', 'accession_number', str),
+    0x0020000E: ('series', 'series_instance_uid', str),
+    0x00200011: ('series', 'series_number', int),
+    0x0008103E: ('series', 'series_description', str),
+    0x00080060: ('series', 'modality', str),
+    0x00080021: ('series', 'series_date', str),
+    0x00080031: ('series', 'series_time', str),
+    0x00080018: ('instance', 'sop_instance_uid', str),
+    0x00200013: ('instance', 'instance_number', int),
+    0x00200012: ('instance', 'acquisition_number', int),
+    0x00200032: ('instance', 'image_position', None),
+    0x00200037: ('instance', 'image_orientation', None),
+    0x00280010: ('image', 'rows', int),
+    0x00280011: ('image', 'columns', int),
+    0x00280030: ('image', 'pixel_spacing', None),
+    0x00180050: ('image', 'slice_thickness', float),
+    0x00201041: ('image', 'slice_location', float),
+    0x00280100: ('image', 'bits_allocated', int),
+    0x00280101: ('image', 'bits_stored', int),
+    0x00281050: ('image', 'window_center', None),
+    0x00281051: ('image', 'window_width', None),
+    0x00281052: ('image', 'rescale_intercept', float),
+    0x00281053: ('image', 'rescale_slope', float)
+}
+
+
+# DICOM tag -> (field, coercer, default) for get_header_record: the few
+# elements the series organizer needs to group, order and label instances
+HEADER_TAGS = {
+    0x0020000D: ('study_uid', str, ''),
+    0x0020000E: ('series_uid', str, ''),
+    0x00080018: ('sop_uid', str, ''),
+    0x00200011: ('series_number', int, 0),
+    0x00200013: ('instance_number', int, 0),
+    0x00201041: ('slice_location', float, None),
+    0x0008103E: ('series_description', str, 'Unknown'),
+    0x00080060: ('modality', str, 'Unknown'),
+    0x00080020: ('study_date', str, 'Unknown'),
+    0x00081030: ('study_description', str, 'Unknown'),
+    0x00100010: ('patient_name', str, 'Unknown'),
+    0x00100020: ('patient_id', str, 'Unknown')
+}
+
+
+# HEADER_TAGS entries with VR UI; read from the raw bytes by _raw_uid
+UID_TAGS = frozenset((0x0020000D, 0x0020000E, 0x00080018))
+
+
+def _raw_uid(dataset: pydicom.Dataset, tag: int) -> str:
+    """
+    Value of a UI element, decoded from the raw bytes when still unconverted
+
+    UIDs are plain ASCII, so this skips pydicom's keyword lookup and
+    VR-based value conversion. Returns '' if the element is absent or empty.
+    """
+    element = dataset.get_item(tag)
+    if element is None or element.value is None:
+        return ''
+    value = element.value
+    if isinstance(value, bytes):
+        return value.decode('ascii', 'replace').rstrip('\x00 ')
+    # Already converted to a UID, which is a str
+    return value
+
+
+def _s(dataset: pydicom.Dataset, keyword: str, default: str = 'Unknown') -> str:
+    """Element value as str; plain str values are returned without a copy"""
+    value = dataset.get(keyword)
+    if value is None:
+        return default
+    return value if type(value) is str else str(value)
+
+
+def _i(dataset: pydicom.Dataset, keyword: str, default: Optional[int] = 0) -> Optional[int]:
+    """Element value as int, or default if absent or empty"""
+    value = dataset.get(keyword)
+    return default if value is None else int(value)
+
+
+def _f(dataset: pydicom.Dataset, keyword: str, default: Optional[float] = None) -> Optional[float]:
+    """Element value as float, or default if absent or empty"""
+    value = dataset.get(keyword)
+    return default if value is None else float(value)
+
+
+def _metadata_defaults() -> Dict:
+    """Default values used by get_all_metadata_fast for absent tags"""
+    return {
+        'patient': {
+            'patient_name': 'Unknown',
+            'patient_id': 'Unknown',
+            'patient_sex': 'Unknown',
+            'patient_birth_date': 'Unknown',
+            'patient_age': 'Unknown'
+        },
+        'study': {
+            'study_instance_uid': '',
+            'study_date': 'Unknown',
+            'study_time': 'Unknown',
+            'study_description': 'Unknown',
+            'accession_number': 'Unknown'
+        },
+        'series': {
+            'series_instance_uid': '',
+            'series_number': 0,
+            'series_description': 'Unknown',
+            'modality': 'Unknown',
+            'series_date': 'Unknown',
+            'series_time': 'Unknown'
+        },
+        'instance': {
+            'sop_instance_uid': '',
+            'instance_number': 0,
+            'acquisition_number': 0,
+            'image_position': None,
+            'image_orientation': None
+        },
+        'image': {
+            'rows': 0,
+            'columns': 0,
+            'pixel_spacing': None,
+            'slice_thickness': None,
+            'slice_location': None,
+            'bits_allocated': 0,
+            'bits_stored': 0,
+            'window_center': None,
+            'window_width': None,
+            'rescale_intercept': 0.0,
+            'rescale_slope': 1.0
+        }
+    }
+
 
 class DICOMParser:
     """Parses DICOM files and extracts relevant information"""
@@ -27,11 +176,11 @@ class DICOMParser:
             Dictionary containing patient information
         """
         return {
-            'patient_name': str(dataset.get('PatientName', 'Unknown')),
-            'patient_id': str(dataset.get('PatientID', 'Unknown')),
-            'patient_sex': str(dataset.get('PatientSex', 'Unknown')),
-            'patient_birth_date': str(dataset.get('PatientBirthDate', 'Unknown')),
-            'patient_age': str(dataset.get('PatientAge', 'Unknown'))
+            'patient_name': _s(dataset, 'PatientName'),
+            'patient_id': _s(dataset, 'PatientID'),
+            'patient_sex': _s(dataset, 'PatientSex'),
+            'patient_birth_date': _s(dataset, 'PatientBirthDate'),
+            'patient_age': _s(dataset, 'PatientAge')
         }
 
     @staticmethod
@@ -46,11 +195,11 @@ class DICOMParser:
             Dictionary containing study information
         """
         return {
-            'study_instance_uid': str(dataset.get('StudyInstanceUID', '')),
-            'study_date': str(dataset.get('StudyDate', 'Unknown')),
-            'study_time': str(dataset.get('StudyTime', 'Unknown')),
-            'study_description': str(dataset.get('StudyDescription', 'Unknown')),
-            'accession_number': str(dataset.get('AccessionNumber', 'Unknown'))
+            'study_instance_uid': _s(dataset, 'StudyInstanceUID', ''),
+            'study_date': _s(dataset, 'StudyDate'),
+            'study_time': _s(dataset, 'StudyTime'),
+            'study_description': _s(dataset, 'StudyDescription'),
+            'accession_number': _s(dataset, 'AccessionNumber')
         }
 
     @staticmethod
@@ -65,12 +214,12 @@ class DICOMParser:
             Dictionary containing series information
         """
         return {
-            'series_instance_uid': str(dataset.get('SeriesInstanceUID', '')),
-            'series_number': int(dataset.get('SeriesNumber', 0)),
-            'series_description': str(dataset.get('SeriesDescription', 'Unknown')),
-            'modality': str(dataset.get('Modality', 'Unknown')),
-            'series_date': str(dataset.get('SeriesDate', 'Unknown')),
-            'series_time': str(dataset.get('SeriesTime', 'Unknown'))
+            'series_instance_uid': _s(dataset, 'SeriesInstanceUID', ''),
+            'series_number': _i(dataset, 'SeriesNumber'),
+            'series_description': _s(dataset, 'SeriesDescription'),
+            'modality': _s(dataset, 'Modality'),
+            'series_date': _s(dataset, 'SeriesDate'),
+            'series_time': _s(dataset, 'SeriesTime')
         }
 
     @staticmethod
@@ -85,9 +234,9 @@ class DICOMParser:
             Dictionary containing instance information
         """
         return {
-            'sop_instance_uid': str(dataset.get('SOPInstanceUID', '')),
-            'instance_number': int(dataset.get('InstanceNumber', 0)),
-            'acquisition_number': int(dataset.get('AcquisitionNumber', 0)),
+            'sop_instance_uid': _s(dataset, 'SOPInstanceUID', ''),
+            'instance_number': _i(dataset, 'InstanceNumber'),
+            'acquisition_number': _i(dataset, 'AcquisitionNumber'),
             'image_position': dataset.get('ImagePositionPatient', None),
             'image_orientation': dataset.get('ImageOrientationPatient', None)
         }
@@ -104,17 +253,17 @@ class DICOMParser:
             Dictionary containing image information
         """
         return {
-            'rows': int(dataset.get('Rows', 0)),
-            'columns': int(dataset.get('Columns', 0)),
+            'rows': _i(dataset, 'Rows'),
+            'columns': _i(dataset, 'Columns'),
             'pixel_spacing': dataset.get('PixelSpacing', None),
-            'slice_thickness': float(dataset.get('SliceThickness', 0)) if 'SliceThickness' in dataset else None,
-            'slice_location': float(dataset.get('SliceLocation', 0)) if 'SliceLocation' in dataset else None,
-            'bits_allocated': int(dataset.get('BitsAllocated', 0)),
-            'bits_stored': int(dataset.get('BitsStored', 0)),
+            'slice_thickness': _f(dataset, 'SliceThickness'),
+            'slice_location': _f(dataset, 'SliceLocation'),
+            'bits_allocated': _i(dataset, 'BitsAllocated'),
+            'bits_stored': _i(dataset, 'BitsStored'),
             'window_center': dataset.get('WindowCenter', None),
             'window_width': dataset.get('WindowWidth', None),
-            'rescale_intercept': float(dataset.get('RescaleIntercept', 0)),
-            'rescale_slope': float(dataset.get('RescaleSlope', 1))
+            'rescale_intercept': _f(dataset, 'RescaleIntercept', 0.0),
+            'rescale_slope': _f(dataset, 'RescaleSlope', 1.0)
         }
 
     @staticmethod
@@ -131,19 +280,76 @@ class DICOMParser:
         try:
             pixel_array = dataset.pixel_array
 
-            # Apply rescale slope and intercept
+            # Apply rescale slope and intercept (one allocation; the decoded
+            # array is cached by pydicom so it must not be modified in place)
             if 'RescaleSlope' in dataset and 'RescaleIntercept' in dataset:
-                pixel_array = pixel_array * dataset.RescaleSlope + dataset.RescaleIntercept
+                pixel_array = np.multiply(pixel_array, float(dataset.RescaleSlope), dtype=np.float64)
+                np.add(pixel_array, float(dataset.RescaleIntercept), out=pixel_array)
 
             return pixel_array
         except Exception as e:
             logger.error(f"Error extracting pixel array: {str(e)}")
             return None
 
+    @staticmethod
+    def get_pixel_memmap(file_path: str,
+                         dataset: Optional[pydicom.Dataset] = None) -> Optional[np.ndarray]:
+        """
+        Memory-map the stored pixel values of a DICOM file
+
+        For uncompressed little-endian files the pixel data is mapped
+        read-only straight from disk, so only the pages actually accessed are
+        read. Compressed or otherwise unsupported files fall back to
+        decoding via pixel_array. No rescale slope/intercept is applied.
+
+        Args:
+            file_path: Path to the DICOM file
+            dataset: Already loaded dataset for file_path, used for the fallback
+
+        Returns:
+            Array of stored pixel values, (Rows, Columns) or
+            (NumberOfFrames, Rows, Columns), or None if extraction fails
+        """
+        try:
+            # Deferred read: PixelData is skipped but its file offset recorded
+            header = pydicom.dcmread(file_path, defer_size="1 KB")
+            transfer_syntax = header.file_meta.TransferSyntaxUID
+            bits_allocated = int(header.get('BitsAllocated', 0))
+            bits_stored = int(header.get('BitsStored', bits_allocated))
+            signed = int(header.get('PixelRepresentation', 0)) == 1
+
+            # Signed values narrower than their container need sign extension
+            if (not transfer_syntax.is_little_endian or transfer_syntax.is_compressed
+                    or transfer_syntax.is_deflated or bits_allocated not in (8, 16, 32)
+                    or int(header.get('SamplesPerPixel', 1)) != 1
+                    or (signed and bits_stored != bits_allocated)):
+                source = dataset if dataset is not None else pydicom.dcmread(file_path)
+                return source.pixel_array
+
+            element = header.get_item(0x7FE00010, keep_deferred=True)
+            if element is None:
+                logger.error(f"No pixel data in {file_path}")
+                return None
+
+            dtype = np.dtype(f"<{'i' if signed else 'u'}{bits_allocated // 8}")
+
+            rows = int(header.Rows)
+            columns = int(header.Columns)
+            frames = int(header.get('NumberOfFrames', 1) or 1)
+            shape = (frames, rows, columns) if frames > 1 else (rows, columns)
+
+            return np.memmap(file_path, dtype=dtype, mode='r',
+                             offset=element.value_tell, shape=shape)
+
+        except Exception as e:
+            logger.error(f"Error mapping pixel data of {file_path}: {str(e)}")
+            return None
+
     @staticmethod
     def get_window_level_image(dataset: pydicom.Dataset,
                                window_center: Optional[float] = None,
-                               window_width: Optional[float] = None) -> Optional[np.ndarray]:
+                               window_width: Optional[float] = None,
+                               out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
         """
         Apply window/level to image for display
 
@@ -151,38 +357,171 @@ class DICOMParser:
             dataset: pydicom.Dataset object
             window_center: Window center value (uses default from DICOM if None)
             window_width: Window width value (uses default from DICOM if None)
+            out: Optional C-contiguous uint8 array to write into, e.g. a buffer
+                 reused across the frames of a series; ignored if its shape
+                 does not match the image
 
         Returns:
             Numpy array with windowed pixel values (0-255)
         """
-        pixel_array = DICOMParser.get_pixel_array(dataset)
-
-        if pixel_array is None:
-            return None
-
-        # Get window values from DICOM if not provided
+        # 16-bit integer images (CT/MR) are windowed straight from the stored
+        # values, skipping the float rescale copy: by the compiled kernel, or
+        # through a lookup table without numba
+        stored = DICOMParser._kernel_source(dataset)
+
+        if stored is not None:
+            slope, intercept = DICOMParser._rescale(dataset)
+            pixel_array = None
+        else:
+            pixel_array = DICOMParser.get_pixel_array(dataset)
+            if pixel_array is None:
+                return None
+            slope, intercept = 1.0, 0.0
+
+        # Get window values from DICOM if not provided; the pixel value range
+        # is only scanned when the dataset has no window either
+        value_range = None
         if window_center is None:
             wc = dataset.get('WindowCenter', None)
             if wc is not None:
-                window_center = float(wc[0]) if isinstance(wc, (list, tuple)) else float(wc)
+                window_center = DICOMParser._first_value(wc)
             else:
-                window_center = (pixel_array.max() + pixel_array.min()) / 2
+                value_range = DICOMParser._value_range(stored, pixel_array, slope, intercept)
+                window_center = (value_range[1] + value_range[0]) / 2
 
         if window_width is None:
             ww = dataset.get('WindowWidth', None)
             if ww is not None:
-                window_width = float(ww[0]) if isinstance(ww, (list, tuple)) else float(ww)
+                window_width = DICOMParser._first_value(ww)
             else:
-                window_width = pixel_array.max() - pixel_array.min()
+                if value_range is None:
+                    value_range = DICOMParser._value_range(stored, pixel_array, slope, intercept)
+                window_width = value_range[1] - value_range[0]
+
+        source = stored if stored is not None else pixel_array
+        return DICOMParser.apply_window(source, slope, intercept, window_center, window_width, out=out)
+
+    @staticmethod
+    def apply_window(values: np.ndarray, slope: float, intercept: float,
+                     window_center: float, window_width: float,
+                     out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Rescale and window pixel values for display
+
+        Contiguous 16-bit integer values go through the compiled kernel (or
+        a lookup table without numba); anything else is windowed in float.
 
-        # Apply window/level
+        Args:
+            values: Stored pixel values (any shape)
+            slope: Rescale slope (1.0 if values are already rescaled)
+            intercept: Rescale intercept (0.0 if values are already rescaled)
+            window_center: Window center, in rescaled units
+            window_width: Window width, in rescaled units
+            out: Optional C-contiguous uint8 array to write into; ignored if
+                 its shape does not match values
+
+        Returns:
+            uint8 array with the shape of values
+        """
         img_min = window_center - window_width / 2
-        img_max = window_center + window_width / 2
+        scale = 255.0 / max(window_width, 1e-6)
+
+        if out is not None and (out.shape != values.shape or out.dtype != np.uint8
+                                or not out.flags.c_contiguous):
+            out = None
+
+        if values.dtype in (np.uint16, np.int16) and values.flags.c_contiguous:
+            if NUMBA_AVAILABLE:
+                return window_level_int16(values, slope, intercept, img_min, scale, out=out)
+            return window_level_lut16(values, slope, intercept, img_min, scale, out=out)
+
+        if slope != 1.0 or intercept != 0.0:
+            values = np.multiply(values, slope, dtype=np.float64)
+            np.add(values, intercept, out=values)
+
+        # Apply window/level in a single float32 buffer
+        windowed = np.empty(values.shape, dtype=np.float32)
+        np.subtract(values, np.float32(img_min), out=windowed)
+        np.multiply(windowed, np.float32(scale), out=windowed)
+        np.clip(windowed, 0, 255, out=windowed)
+
+        if out is None:
+            return windowed.astype(np.uint8, copy=False)
+        np.copyto(out, windowed, casting='unsafe')
+        return out
+
+    @staticmethod
+    def apply_window_resized(values: np.ndarray, slope: float, intercept: float,
+                             window_center: float, window_width: float,
+                             shape: Tuple[int, int],
+                             out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Window pixel values and resize them (nearest neighbour) for display
+
+        Same as apply_window followed by a nearest neighbour resize, but only
+        the pixels that are displayed are windowed.
+
+        Args:
+            values: 2-D stored pixel values
+            slope: Rescale slope (1.0 if values are already rescaled)
+            intercept: Rescale intercept (0.0 if values are already rescaled)
+            window_center: Window center, in rescaled units
+            window_width: Window width, in rescaled units
+            shape: Output (rows, columns)
+            out: Optional C-contiguous uint8 array to write into; ignored if
+                 its shape does not match shape
+
+        Returns:
+            uint8 array of the given shape
+        """
+        shape = tuple(shape)
+        if out is not None and (out.shape != shape or out.dtype != np.uint8
+                                or not out.flags.c_contiguous):
+            out = None
 
-        windowed = np.clip(pixel_array, img_min, img_max)
-        windowed = ((windowed - img_min) / (img_max - img_min) * 255).astype(np.uint8)
+        if values.dtype in (np.uint16, np.int16) and values.ndim == 2:
+            img_min = window_center - window_width / 2
+            scale = 255.0 / max(window_width, 1e-6)
+            return window_level_resized16(values, slope, intercept, img_min, scale, shape, out=out)
 
-        return windowed
+        rows = nearest_indices(values.shape[0], shape[0])
+        columns = nearest_indices(values.shape[1], shape[1])
+        sampled = values[rows[:, None], columns]
+        return DICOMParser.apply_window(sampled, slope, intercept, window_center, window_width, out=out)
+
+    @staticmethod
+    def _value_range(stored: Optional[np.ndarray], pixel_array: Optional[np.ndarray],
+                     slope: float, intercept: float) -> Tuple[float, float]:
+        """(min, max) pixel value after rescale, from whichever array is set"""
+        source = stored if stored is not None else pixel_array
+        return tuple(sorted((float(source.min()) * slope + intercept,
+                             float(source.max()) * slope + intercept)))
+
+    @staticmethod
+    def _first_value(value) -> float:
+        """First value of a possibly multi-valued element (e.g. Window Center), as float"""
+        if isinstance(value, (list, tuple, MultiValue)):
+            value = value[0]
+        return float(value)
+
+    @staticmethod
+    def _rescale(dataset: pydicom.Dataset) -> Tuple[float, float]:
+        """Rescale (slope, intercept) as applied by get_pixel_array"""
+        if 'RescaleSlope' in dataset and 'RescaleIntercept' in dataset:
+            return float(dataset.RescaleSlope), float(dataset.RescaleIntercept)
+        return 1.0, 0.0
+
+    @staticmethod
+    def _kernel_source(dataset: pydicom.Dataset) -> Optional[np.ndarray]:
+        """Stored pixel values if apply_window takes its 16-bit path for them, else None"""
+        try:
+            stored = dataset.pixel_array
+        except Exception:
+            return None
+
+        if stored.dtype not in (np.uint16, np.int16) or not stored.flags.c_contiguous:
+            return None
+        return stored
 
     @staticmethod
     def get_all_metadata(dataset: pydicom.Dataset) -> Dict:
@@ -202,3 +541,75 @@ class DICOMParser:
             'instance': DICOMParser.get_instance_info(dataset),
             'image': DICOMParser.get_image_info(dataset)
         }
+
+    @staticmethod
+    def get_all_metadata_fast(dataset: pydicom.Dataset) -> Dict:
+        """
+        Extract the same metadata as get_all_metadata in a single pass
+
+        Walks the dataset's tags once and converts only the elements listed
+        in _WANTED_TAGS, addressing them by integer tag instead of keyword.
+        Empty or malformed values keep their defaults.
+
+        Args:
+            dataset: pydicom.Dataset object
+
+        Returns:
+            Dictionary containing all metadata
+        """
+        metadata = _metadata_defaults()
+
+        for tag in dataset.keys():
+            spec = _WANTED_TAGS.get(tag)
+            if spec is None:
+                continue
+
+            section, field, cast = spec
+            value = dataset[tag].value
+            if value is None or value == '':
+                continue
+
+            if cast is None:
+                metadata[section][field] = value
+            else:
+                try:
+                    metadata[section][field] = cast(value)
+                except (TypeError, ValueError):
+                    pass
+
+        return metadata
+
+    @staticmethod
+    def get_header_record(dataset: pydicom.Dataset) -> Dict:
+        """
+        Extract the flat header record used to organize studies and series
+
+        Only the elements in HEADER_TAGS are looked up, by integer tag; UIDs
+        are read without value conversion (see _raw_uid). Absent, empty or
+        malformed values get the defaults from HEADER_TAGS.
+
+        Args:
+            dataset: pydicom.Dataset object (a header-only read is enough)
+
+        Returns:
+            Dictionary with one entry per HEADER_TAGS field
+        """
+        record = {}
+
+        for tag, (field, cast, default) in HEADER_TAGS.items():
+            if tag in UID_TAGS:
+                record[field] = _raw_uid(dataset, tag) or default
+                continue
+
+            element = dataset.get(tag)
+            value = element.value if element is not None else None
+            if value is None or value == '':
+                record[field] = default
+                continue
+
+            try:
+                record[field] = cast(value)
+            except (TypeError, ValueError):
+                record[field] = default
+
+        return record
@@ -4,55 +4,227 @@ Organizes DICOM files into studies and series
 """
 
 import pydicom
-from typing import List, Dict
-from collections import defaultdict
+import numpy as np
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 import logging
+import os
+import sys
 
-from .parser import DICOMParser
+from .parser import DICOMParser, HEADER_TAGS
+from ._header_scan import scan_header
 
 logger = logging.getLogger(__name__)
 
 
+def read_header_records(file_paths: List[str]) -> List[Dict]:
+    """
+    Read the organizer header records of many files in one batch
+
+    Each file is read only up to the pixel data, and only the elements in
+    HEADER_TAGS are decoded. Plain little endian files are scanned directly
+    (see scan_header); others go through pydicom.
+
+    Args:
+        file_paths: Paths to DICOM files
+
+    Returns:
+        List of header records (see DICOMParser.get_header_record), each
+        with its 'file_path'; unreadable files are skipped
+    """
+    specific_tags = list(HEADER_TAGS)
+    records = []
+
+    for file_path in file_paths:
+        record = scan_header(file_path)
+        if record is None:
+            try:
+                dataset = pydicom.dcmread(file_path, stop_before_pixels=True, specific_tags=specific_tags)
+            except Exception as e:
+                logger.error(f"Error reading header of {file_path}: {str(e)}")
+                continue
+            record = DICOMParser.get_header_record(dataset)
+
+        record['file_path'] = file_path
+        records.append(record)
+
+    return records
+
+
+def _read_frame(path: str) -> Optional[Tuple[np.ndarray, float, float]]:
+    """Decode the frame of a file; returns (frame, slope, intercept), None if unreadable"""
+    try:
+        dataset = pydicom.dcmread(path)
+        slope, intercept = DICOMParser._rescale(dataset)
+        return dataset.pixel_array, slope, intercept
+    except Exception as e:
+        logger.warning(f"Skipping {path}: {str(e)}")
+        return None
+
+
+def _store_frame(target: np.ndarray, frame: Tuple[np.ndarray, float, float], rescale: bool):
+    """Copy a frame read by _read_frame into a slice of a volume"""
+    pixels, slope, intercept = frame
+    if rescale and np.issubdtype(target.dtype, np.integer):
+        # Rounded and clipped to the volume dtype rather than wrapped around
+        values = pixels * slope + intercept
+        np.rint(values, out=values)
+        limits = np.iinfo(target.dtype)
+        np.clip(values, limits.min, limits.max, out=values)
+        target[...] = values
+    elif rescale:
+        np.multiply(pixels, slope, out=target, casting='unsafe')
+        target += intercept
+    else:
+        target[...] = pixels
+
+
 class DICOMSeries:
-    """Represents a DICOM series with multiple instances"""
+    """
+    Represents a DICOM series with multiple instances
+
+    Instances are stored as parallel arrays (paths, sop_uids,
+    instance_numbers, slice_locations), all in series order. The full
+    dataset of an instance is read on demand from its path. A missing slice
+    location is stored as NaN.
+    """
 
     def __init__(self, series_instance_uid: str):
         self.series_instance_uid = series_instance_uid
         self.series_number = None
         self.series_description = ""
         self.modality = ""
-        self.instances = []
-        self.datasets = []
+        self.paths: List[str] = []
+        self.sop_uids: List[str] = []
+        self.instance_numbers = array('q')
+        self.slice_locations = array('d')
+        self._str_cache: Optional[str] = None
 
-    def add_instance(self, dataset: pydicom.Dataset):
-        """Add an instance to the series"""
-        self.datasets.append(dataset)
+    def add_instance(self, record: Dict):
+        """
+        Add an instance to the series
+
+        Args:
+            record: Header record of the instance, with its 'file_path'
+        """
+        self.paths.append(record['file_path'])
+        self.sop_uids.append(record['sop_uid'])
+        self.instance_numbers.append(record['instance_number'] or 0)
+        slice_location = record['slice_location']
+        self.slice_locations.append(slice_location if slice_location is not None else np.nan)
+        self._str_cache = None
 
         # Update series info from first instance
-        if len(self.datasets) == 1:
-            series_info = DICOMParser.get_series_info(dataset)
-            self.series_number = series_info['series_number']
-            self.series_description = series_info['series_description']
-            self.modality = series_info['modality']
+        if len(self.paths) == 1:
+            self.series_number = record['series_number']
+            self.series_description = record['series_description']
+            self.modality = record['modality']
 
     def sort_instances(self):
-        """Sort instances by instance number or slice location"""
-        try:
-            # Try to sort by instance number
-            self.datasets.sort(key=lambda d: int(d.get('InstanceNumber', 0)))
-        except:
+        """Sort instances by instance number, or by slice location if unnumbered"""
+        numbers = np.frombuffer(self.instance_numbers, dtype=np.int64)
+        locations = np.frombuffer(self.slice_locations, dtype=np.float64)
+
+        if numbers.any():
+            order = np.argsort(numbers, kind='stable')
+        elif not np.isnan(locations).all():
+            # Missing locations sort as 0.0
+            order = np.argsort(np.nan_to_num(locations, nan=0.0), kind='stable')
+        else:
+            if len(self.paths) > 1:
+                logger.warning(f"Series {self.series_instance_uid} has no instance numbers "
+                               f"or slice locations; keeping read order")
+            return
+
+        self.instance_numbers = array('q', numbers[order].tobytes())
+        self.slice_locations = array('d', locations[order].tobytes())
+        order = order.tolist()
+        self.paths = [self.paths[i] for i in order]
+        self.sop_uids = [self.sop_uids[i] for i in order]
+
+    def get_file_paths(self) -> List[str]:
+        """Get the file paths of the instances in series order"""
+        return list(self.paths)
+
+    def as_volume(self, dtype=None, rescale: bool = False) -> Optional[np.ndarray]:
+        """
+        Read the frames of the series into one preallocated volume
+
+        Files are read in a thread pool (decoders of compressed pixel data
+        run without the GIL), each decoded frame is copied straight into its
+        slice of the volume and released, so peak memory is the volume plus
+        a frame per thread. Files that cannot be read, or whose frame size
+        differs from the first one, are left out.
+
+        Args:
+            dtype: Volume dtype; defaults to float32 when rescaling, else the
+                   dtype of the first frame. Rescaled values are rounded
+                   and clipped to an integer dtype.
+            rescale: Apply each file's rescale slope/intercept
+
+        Returns:
+            (frames, rows, columns) array in series order, or None if no
+            frame could be read
+        """
+        # The first readable frame gives the volume's shape and dtype
+        frame = None
+        for first, path in enumerate(self.paths):
+            frame = _read_frame(path)
+            if frame is not None:
+                break
+        if frame is None:
+            return None
+
+        if dtype is None:
+            dtype = np.float32 if rescale else frame[0].dtype
+        volume = np.empty((len(self.paths),) + frame[0].shape, dtype=dtype)
+        _store_frame(volume[first], frame, rescale)
+        del frame
+
+        def read_into(index: int) -> bool:
+            path = self.paths[index]
+            frame = _read_frame(path)
+            if frame is None:
+                return False
+            if frame[0].shape != volume.shape[1:]:
+                logger.warning(f"Skipping {path}: frame size {frame[0].shape} differs from {volume.shape[1:]}")
+                return False
+            _store_frame(volume[index], frame, rescale)
+            return True
+
+        rest = range(first + 1, len(self.paths))
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            read = list(executor.map(read_into, rest))
+
+        # Close the gaps left by the files that were skipped
+        if first:
+            volume[0] = volume[first]
+        count = 1
+        for index, ok in zip(rest, read):
+            if ok:
+                if index != count:
+                    volume[count] = volume[index]
+                count += 1
+
+        if count < len(volume):
+            # Give back the memory of the slices left out, in place
             try:
-                # Try to sort by slice location
-                self.datasets.sort(key=lambda d: float(d.get('SliceLocation', 0)))
-            except:
-                logger.warning(f"Could not sort series {self.series_instance_uid}")
+                volume.resize((count,) + volume.shape[1:])
+            except ValueError:
+                # Still referenced elsewhere (e.g. by a debugger)
+                return volume[:count]
+        return volume
 
     def get_instance_count(self) -> int:
         """Get the number of instances in this series"""
-        return len(self.datasets)
+        return len(self.paths)
 
     def __str__(self):
-        return f"Series {self.series_number}: {self.series_description} ({self.modality}) - {self.get_instance_count()} images"
+        if self._str_cache is None:
+            self._str_cache = f"Series {self.series_number}: {self.series_description} ({self.modality}) - {self.get_instance_count()} images"
+        return self._str_cache
 
 
 class DICOMStudy:
@@ -66,36 +238,67 @@ class DICOMStudy:
         self.patient_id = ""
         self.series_dict: Dict[str, DICOMSeries] = {}
 
-    def add_dataset(self, dataset: pydicom.Dataset):
-        """Add a dataset to the appropriate series"""
-        # Update study info from first dataset
-        if len(self.series_dict) == 0:
-            study_info = DICOMParser.get_study_info(dataset)
-            patient_info = DICOMParser.get_patient_info(dataset)
-            self.study_date = study_info['study_date']
-            self.study_description = study_info['study_description']
-            self.patient_name = patient_info['patient_name']
-            self.patient_id = patient_info['patient_id']
+        # Series of the previous record; consecutive files usually share it
+        self._last_series_uid: Optional[str] = None
+        self._last_series: Optional[DICOMSeries] = None
 
-        # Get or create series
-        series_uid = str(dataset.get('SeriesInstanceUID', ''))
-        if series_uid not in self.series_dict:
-            self.series_dict[series_uid] = DICOMSeries(series_uid)
+        # Sorted series, rebuilt only after a series is added
+        self._series_list: Optional[List[DICOMSeries]] = None
+        self._str_cache: Optional[str] = None
 
-        self.series_dict[series_uid].add_instance(dataset)
+    def add_record(self, record: Dict) -> bool:
+        """
+        Add an instance to the appropriate series
+
+        Args:
+            record: Header record of the instance, with its 'file_path'
+
+        Returns:
+            True if the instance started a new series
+        """
+        # Update study info from first instance
+        if len(self.series_dict) == 0:
+            self.study_date = record['study_date']
+            self.study_description = record['study_description']
+            self.patient_name = record['patient_name']
+            self.patient_id = record['patient_id']
+
+        # Get or create series; UIDs are interned (as plain str) only when
+        # they differ from the previous record's
+        series_uid = record['series_uid']
+        new_series = False
+        if series_uid == self._last_series_uid:
+            series = self._last_series
+        else:
+            series_uid = sys.intern(str(series_uid))
+            series = self.series_dict.get(series_uid)
+            if series is None:
+                series = self.series_dict[series_uid] = DICOMSeries(series_uid)
+                self._series_list = None
+                self._str_cache = None
+                new_series = True
+            self._last_series_uid = series_uid
+            self._last_series = series
+
+        series.add_instance(record)
+        return new_series
 
     def get_series_list(self) -> List[DICOMSeries]:
         """Get sorted list of series"""
-        series_list = list(self.series_dict.values())
-        series_list.sort(key=lambda s: s.series_number if s.series_number else 0)
-        return series_list
+        if self._series_list is None:
+            series_list = list(self.series_dict.values())
+            series_list.sort(key=lambda s: s.series_number if s.series_number else 0)
+            self._series_list = series_list
+        return self._series_list
 
     def get_series_count(self) -> int:
         """Get the number of series in this study"""
         return len(self.series_dict)
 
     def __str__(self):
-        return f"Study: {self.study_description} ({self.study_date}) - {self.get_series_count()} series"
+        if self._str_cache is None:
+            self._str_cache = f"Study: {self.study_description} ({self.study_date}) - {self.get_series_count()} series"
+        return self._str_cache
 
 
 class SeriesOrganizer:
@@ -104,12 +307,89 @@ class SeriesOrganizer:
     def __init__(self):
         self.studies_dict: Dict[str, DICOMStudy] = {}
 
+        # Studies in ascending study date order, with their dates as bisect
+        # keys; kept sorted as studies are created
+        self._study_dates: List[str] = []
+        self._studies_by_date: List[DICOMStudy] = []
+
+        # Study of the previous record; consecutive files usually share it
+        self._last_study_uid: Optional[str] = None
+        self._last_study: Optional[DICOMStudy] = None
+
+        # Running totals, kept up to date by add_record
+        self._total_series = 0
+        self._total_instances = 0
+
+    def add_files(self, file_paths: List[str]):
+        """
+        Read the headers of files and organize them into studies and series
+
+        Only header elements are read; pixel data is loaded later, when an
+        instance is displayed.
+
+        Args:
+            file_paths: Paths to DICOM files
+        """
+        self.add_records(read_header_records(file_paths))
+
+    def add_records(self, records: List[Dict]):
+        """
+        Add multiple header records
+
+        Args:
+            records: Header records with their 'file_path' (see read_header_records)
+        """
+        for record in records:
+            self.add_record(record)
+
+    def add_record(self, record: Dict):
+        """
+        Add a single header record
+
+        Args:
+            record: Header record with its 'file_path'
+        """
+        # Get or create study
+        study_uid = record['study_uid']
+
+        if not study_uid:
+            logger.warning("Dataset missing StudyInstanceUID, skipping")
+            return
+
+        new_study = False
+        if study_uid == self._last_study_uid:
+            study = self._last_study
+        else:
+            study_uid = sys.intern(str(study_uid))
+            study = self.studies_dict.get(study_uid)
+            if study is None:
+                study = self.studies_dict[study_uid] = DICOMStudy(study_uid)
+                new_study = True
+            self._last_study_uid = study_uid
+            self._last_study = study
+
+        if study.add_record(record):
+            self._total_series += 1
+        self._total_instances += 1
+
+        # The study date is known once the first record is added
+        if new_study:
+            self._insert_study(study)
+
+    def _insert_study(self, study: DICOMStudy):
+        """Insert a new study (with its date set) into the date-ordered list"""
+        # bisect_left places it before studies of the same date, so it comes
+        # after them in the newest-first order of get_studies_list
+        index = bisect_left(self._study_dates, study.study_date)
+        self._study_dates.insert(index, study.study_date)
+        self._studies_by_date.insert(index, study)
+
     def add_datasets(self, datasets: List[pydicom.Dataset]):
         """
         Add multiple datasets and organize them into studies and series
 
         Args:
-            datasets: List of pydicom.Dataset objects
+            datasets: List of pydicom.Dataset objects read from files
         """
         for dataset in datasets:
             self.add_dataset(dataset)
@@ -118,26 +398,23 @@ class SeriesOrganizer:
         """
         Add a single dataset
 
+        Only its header values and file name are kept.
+
         Args:
-            dataset: pydicom.Dataset object
+            dataset: pydicom.Dataset object read from a file
         """
-        # Get or create study
-        study_uid = str(dataset.get('StudyInstanceUID', ''))
-
-        if not study_uid:
-            logger.warning("Dataset missing StudyInstanceUID, skipping")
+        file_path = getattr(dataset, 'filename', None)
+        if not file_path:
+            logger.warning("Dataset was not read from a file, skipping")
             return
 
-        if study_uid not in self.studies_dict:
-            self.studies_dict[study_uid] = DICOMStudy(study_uid)
-
-        self.studies_dict[study_uid].add_dataset(dataset)
+        record = DICOMParser.get_header_record(dataset)
+        record['file_path'] = str(file_path)
+        self.add_record(record)
 
     def get_studies_list(self) -> List[DICOMStudy]:
-        """Get sorted list of studies"""
-        studies_list = list(self.studies_dict.values())
-        studies_list.sort(key=lambda s: s.study_date, reverse=True)
-        return studies_list
+        """Get list of studies, newest study date first"""
+        return self._studies_by_date[::-1]
 
     def sort_all_series(self):
         """Sort instances in all series"""
@@ -151,22 +428,24 @@ class SeriesOrganizer:
 
     def get_total_series(self) -> int:
         """Get total number of series across all studies"""
-        return sum(study.get_series_count() for study in self.studies_dict.values())
+        return self._total_series
 
     def get_total_instances(self) -> int:
         """Get total number of instances across all series"""
-        total = 0
-        for study in self.studies_dict.values():
-            for series in study.series_dict.values():
-                total += series.get_instance_count()
-        return total
+        return self._total_instances
 
     def clear(self):
         """Clear all organized data"""
         self.studies_dict.clear()
+        self._study_dates.clear()
+        self._studies_by_date.clear()
+        self._last_study_uid = None
+        self._last_study = None
+        self._total_series = 0
+        self._total_instances = 0
 
     def get_summary(self) -> str:
         """Get a summary of organized data"""
-        return (f"Organized: {self.get_total_studies()} studies, "
-                f"{self.get_total_series()} series, "
-                f"{self.get_total_instances()} instances")
+        return (f"Organized: {len(self.studies_dict)} studies, "
+                f"{self._total_series} series, "
+                f"{self._total_instances} instances")
@@ -6,9 +6,11 @@ PyQt5-based graphical user interface
 from .main_window import MainWindow
 from .viewer_widget import ViewerWidget
 from .series_navigator import SeriesNavigator
+from .study_tree_model import StudyTreeModel
 
 __all__ = [
     'MainWindow',
     'ViewerWidget',
-    'SeriesNavigator'
+    'SeriesNavigator',
+    'StudyTreeModel'
 ]
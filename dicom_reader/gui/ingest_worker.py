@@ -0,0 +1,200 @@
+"""
+Ingest Worker
+Reads DICOM headers off the GUI thread and streams them to the organizer
+"""
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from itertools import islice
+from typing import Dict, List, Optional
+import logging
+import os
+import threading
+
+from ..dicom.loader import DICOMLoader, PARALLEL_MIN_FILES, process_pool
+from ..dicom.series_organizer import read_header_records
+
+logger = logging.getLogger(__name__)
+
+# Files per header batch while a directory is still being searched, when
+# the total is not known yet
+DIRECTORY_BATCH_SIZE = 64
+
+# Pool shared by all loads for validating and parsing; started on first use
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Get the shared header parsing pool"""
+    global _executor
+    if _executor is None:
+        # Workers are started from the ingest thread, so they must be spawned
+        _executor = process_pool()
+    return _executor
+
+
+class DicomIngestWorker(QObject):
+    """
+    Finds DICOM files and parses their headers in a process pool
+
+    Meant to be moved to a QThread. Header records are emitted in batches
+    as they are parsed, so the organizer and the progress bar update while
+    the load is still running. For a directory, parsing starts while files
+    are still being found, and files_found is emitted again as the count
+    grows. finished is emitted last, also after error or cancel.
+    """
+
+    files_found = pyqtSignal(int)
+    batch_ready = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int)
+    error = pyqtSignal(str)
+
+    def __init__(self, loader: DICOMLoader, file_paths: Optional[List[str]] = None,
+                 directory: Optional[str] = None):
+        """
+        Initialize the worker
+
+        Args:
+            loader: Loader used to find the DICOM files of a directory
+            file_paths: Files to parse (used when no directory is given)
+            directory: Directory to search for DICOM files
+        """
+        super().__init__()
+        self.loader = loader
+        self.file_paths = list(file_paths or [])
+        self.directory = directory
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """
+        Stop the load after the batch being parsed (callable from any thread)
+
+        Batches not started yet are dropped, so a thread waiting for the
+        worker only waits for the headers already being read.
+        """
+        self._cancelled.set()
+
+    @pyqtSlot()
+    def run(self):
+        """Parse the headers of the files (found in the directory, if given)"""
+        parsed = 0
+        try:
+            if self.directory is not None:
+                parsed = self._ingest_directory()
+            else:
+                parsed = self._ingest_files()
+
+        except Exception as e:
+            logger.error(f"Error reading DICOM headers: {str(e)}", exc_info=True)
+            self.error.emit(str(e))
+
+        self.finished.emit(parsed)
+
+    def _ingest_files(self) -> int:
+        """Parse the headers of self.file_paths; returns the number parsed"""
+        total = len(self.file_paths)
+        self.files_found.emit(total)
+
+        # About four batches per worker keeps the pool busy while still
+        # reporting progress regularly
+        batch_size = max(1, total // (4 * (os.cpu_count() or 1)))
+        batches = [self.file_paths[i:i + batch_size] for i in range(0, total, batch_size)]
+
+        if total < PARALLEL_MIN_FILES:
+            futures = None
+            results = map(read_header_records, batches)
+        else:
+            executor = _get_executor()
+            futures = [executor.submit(read_header_records, batch) for batch in batches]
+            results = (future.result() for future in futures)
+
+        parsed = 0
+        done = 0
+        for batch, records in zip(batches, results):
+            done += len(batch)
+            parsed += len(records)
+            self.batch_ready.emit(records)
+            self.progress.emit(done, total)
+
+            if self._cancelled.is_set():
+                for future in futures or ():
+                    future.cancel()
+                break
+
+        return parsed
+
+    def _ingest_directory(self) -> int:
+        """Find the DICOM files of self.directory and parse them as they are found"""
+        if not os.path.isdir(self.directory):
+            logger.error(f"Directory does not exist: {self.directory}")
+            self.files_found.emit(0)
+            return 0
+
+        executor = _get_executor()
+        paths = self.loader.iter_dicom_files(self.directory, executor=executor)
+
+        # Small directories are parsed in this thread
+        head = list(islice(paths, PARALLEL_MIN_FILES))
+        if len(head) < PARALLEL_MIN_FILES:
+            self.file_paths = head
+            self.loader.dicom_files.extend(head)
+            return self._ingest_files()
+
+        pending: Dict[Future, int] = {}
+        found = len(head)
+        done = 0
+        parsed = 0
+
+        def forward(future: Future):
+            nonlocal done, parsed
+            records = future.result()
+            done += pending.pop(future)
+            parsed += len(records)
+            self.batch_ready.emit(records)
+            self.progress.emit(done, found)
+
+        # The files found so far are parsed while the search goes on (a copy
+        # is submitted, as file_paths keeps growing)
+        self.file_paths = head
+        pending[executor.submit(read_header_records, list(head))] = len(head)
+        batch = []
+        self.files_found.emit(found)
+
+        for path in paths:
+            if self._cancelled.is_set():
+                break
+            self.file_paths.append(path)
+            batch.append(path)
+            found += 1
+
+            if len(batch) == DIRECTORY_BATCH_SIZE:
+                pending[executor.submit(read_header_records, batch)] = len(batch)
+                batch = []
+                self.files_found.emit(found)
+
+                # Forward finished batches without waiting for the search
+                for future in [f for f in pending if f.done()]:
+                    forward(future)
+
+        if self._cancelled.is_set():
+            # Stops the validation of the files still queued
+            paths.close()
+            for future in pending:
+                future.cancel()
+            return parsed
+
+        if batch:
+            pending[executor.submit(read_header_records, batch)] = len(batch)
+        self.files_found.emit(found)
+
+        for future in as_completed(list(pending)):
+            forward(future)
+            if self._cancelled.is_set():
+                for queued in pending:
+                    queued.cancel()
+                return parsed
+
+        self.loader.dicom_files.extend(self.file_paths)
+        logger.info(f"Found {found} DICOM files in {self.directory}")
+        return parsed
@@ -4,21 +4,26 @@ The primary interface for the DICOM reader application
 """
 
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QFileDialog, QSplitter, QTreeWidget,
-                             QTreeWidgetItem, QStatusBar, QMenuBar, QMenu,
+                             QPushButton, QFileDialog, QSplitter, QTreeView,
+                             QStatusBar, QMenuBar, QMenu,
                              QAction, QMessageBox, QLabel, QProgressBar)
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, QModelIndex, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon
 import logging
 import os
 
 from ..dicom.loader import DICOMLoader
 from ..dicom.series_organizer import SeriesOrganizer, DICOMStudy, DICOMSeries
+from .ingest_worker import DicomIngestWorker
+from .study_tree_model import StudyTreeModel
 from .viewer_widget import ViewerWidget
 from .series_navigator import SeriesNavigator
 
 logger = logging.getLogger(__name__)
 
+# Minimum time between status bar updates while loading
+STATUS_INTERVAL_MS = 100
+
 
 class MainWindow(QMainWindow):
     """Main application window"""
@@ -29,6 +34,13 @@ class MainWindow(QMainWindow):
         self.series_organizer = SeriesOrganizer()
         self.current_series = None
 
+        # Header loading in progress (see start_ingest)
+        self.ingest_thread = None
+        self.ingest_worker = None
+        self.ingest_failed = False
+        self.ingest_active = False
+        self.status_update_pending = False
+
         self.init_ui()
 
     def init_ui(self):
@@ -52,7 +64,7 @@ class MainWindow(QMainWindow):
         splitter.addWidget(left_panel)
 
         # Right panel - Image viewer
-        self.viewer_widget = ViewerWidget()
+        self.viewer_widget = ViewerWidget(self.dicom_loader)
         splitter.addWidget(self.viewer_widget)
 
         # Set initial sizes (30% left, 70% right)
@@ -143,9 +155,11 @@ class MainWindow(QMainWindow):
         layout.addLayout(button_layout)
 
         # Study/Series tree
-        self.study_tree = QTreeWidget()
-        self.study_tree.setHeaderLabels(["Studies and Series"])
-        self.study_tree.itemClicked.connect(self.on_tree_item_clicked)
+        self.study_model = StudyTreeModel(self.series_organizer, self)
+        self.study_tree = QTreeView()
+        self.study_tree.setModel(self.study_model)
+        self.study_tree.setUniformRowHeights(True)
+        self.study_tree.clicked.connect(self.on_tree_item_clicked)
         layout.addWidget(self.study_tree)
 
         # Series navigator
@@ -180,107 +194,117 @@ class MainWindow(QMainWindow):
 
     def load_dicom_directory(self, directory: str):
         """Load DICOM files from directory"""
-        self.status_bar.showMessage(f"Loading DICOM files from {directory}...")
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # Indeterminate progress
-
-        try:
-            # Clear previous data
-            self.dicom_loader.clear()
-            self.series_organizer.clear()
-            self.study_tree.clear()
-
-            # Load files
-            file_paths = self.dicom_loader.load_from_directory(directory)
-
-            if not file_paths:
-                QMessageBox.warning(self, "No DICOM Files", "No DICOM files found in the selected directory.")
-                self.status_bar.showMessage("Ready")
-                self.progress_bar.setVisible(False)
-                return
-
-            # Load datasets
-            datasets = self.dicom_loader.load_files(file_paths)
-
-            # Organize into series
-            self.series_organizer.add_datasets(datasets)
-            self.series_organizer.sort_all_series()
-
-            # Update UI
-            self.populate_study_tree()
-
-            summary = self.series_organizer.get_summary()
-            self.status_bar.showMessage(f"Loaded: {summary}")
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error loading DICOM files: {str(e)}")
-            logger.error(f"Error loading directory: {str(e)}", exc_info=True)
-            self.status_bar.showMessage("Error loading files")
-
-        finally:
-            self.progress_bar.setVisible(False)
+        worker = DicomIngestWorker(self.dicom_loader, directory=directory)
+        self.start_ingest(worker, f"Loading DICOM files from {directory}...")
 
     def load_dicom_files(self, file_paths: list):
         """Load individual DICOM files"""
-        self.status_bar.showMessage("Loading DICOM files...")
+        worker = DicomIngestWorker(self.dicom_loader, file_paths=file_paths)
+        self.start_ingest(worker, "Loading DICOM files...")
+
+    def start_ingest(self, worker: DicomIngestWorker, message: str):
+        """
+        Run a header loading worker on a background thread
+
+        Args:
+            worker: Worker to run
+            message: Status bar message while loading
+        """
+        if self.ingest_thread is not None:
+            self.status_bar.showMessage("Still loading the previous selection...")
+            return
+
+        self.status_bar.showMessage(message)
         self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)
-
-        try:
-            # Clear previous data
-            self.dicom_loader.clear()
-            self.series_organizer.clear()
-            self.study_tree.clear()
-
-            # Load datasets
-            datasets = self.dicom_loader.load_files(file_paths)
+        self.progress_bar.setRange(0, 0)  # Indeterminate until the files are counted
+
+        # Clear previous data
+        self.dicom_loader.clear()
+        self.series_organizer.clear()
+        self.study_model.reset()
+        self.ingest_failed = False
+        self.ingest_active = True
+
+        thread = QThread(self)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.files_found.connect(self.on_ingest_files_found)
+        worker.batch_ready.connect(self.on_ingest_batch)
+        worker.progress.connect(self.on_ingest_progress)
+        worker.error.connect(self.on_ingest_error)
+        worker.finished.connect(self.on_ingest_finished)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(self.on_ingest_thread_finished)
+
+        self.ingest_thread = thread
+        self.ingest_worker = worker
+        thread.start()
+
+    def on_ingest_files_found(self, total: int):
+        """Set the progress bar range to the number of files found so far"""
+        if total:
+            self.progress_bar.setMaximum(total)
+
+    def on_ingest_batch(self, records: list):
+        """Organize a batch of header records from the worker"""
+        self.series_organizer.add_records(records)
+
+    def on_ingest_progress(self, done: int, total: int):
+        """Update the progress bar, and the status bar at most every STATUS_INTERVAL_MS"""
+        self.progress_bar.setValue(done)
+
+        if not self.status_update_pending:
+            self.status_update_pending = True
+            QTimer.singleShot(STATUS_INTERVAL_MS, self.show_ingest_status)
+
+    def show_ingest_status(self):
+        """Show what has been organized so far"""
+        self.status_update_pending = False
+        if self.ingest_active:
+            self.status_bar.showMessage(f"Loading... {self.series_organizer.get_summary()}")
+
+    def on_ingest_error(self, message: str):
+        """Report a failed load"""
+        self.ingest_failed = True
+        QMessageBox.critical(self, "Error", f"Error loading DICOM files: {message}")
+        self.status_bar.showMessage("Error loading files")
+
+    def on_ingest_finished(self, parsed: int):
+        """Sort and display everything loaded"""
+        self.ingest_active = False
+        self.progress_bar.setVisible(False)
 
-            if not datasets:
-                QMessageBox.warning(self, "No DICOM Files", "Could not load any valid DICOM files.")
-                self.status_bar.showMessage("Ready")
-                self.progress_bar.setVisible(False)
-                return
+        if self.ingest_failed:
+            return
 
-            # Organize into series
-            self.series_organizer.add_datasets(datasets)
-            self.series_organizer.sort_all_series()
+        if not self.series_organizer.get_total_studies():
+            QMessageBox.warning(self, "No DICOM Files", "No valid DICOM files were found.")
+            self.status_bar.showMessage("Ready")
+            return
 
-            # Update UI
-            self.populate_study_tree()
+        self.series_organizer.sort_all_series()
 
-            summary = self.series_organizer.get_summary()
-            self.status_bar.showMessage(f"Loaded: {summary}")
+        # Update UI
+        self.populate_study_tree()
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error loading DICOM files: {str(e)}")
-            logger.error(f"Error loading files: {str(e)}", exc_info=True)
-            self.status_bar.showMessage("Error loading files")
+        summary = self.series_organizer.get_summary()
+        self.status_bar.showMessage(f"Loaded: {summary}")
 
-        finally:
-            self.progress_bar.setVisible(False)
+    def on_ingest_thread_finished(self):
+        """Release the worker and its thread once the thread has stopped"""
+        self.ingest_thread.deleteLater()
+        self.ingest_worker.deleteLater()
+        self.ingest_thread = None
+        self.ingest_worker = None
 
     def populate_study_tree(self):
-        """Populate the study/series tree widget"""
-        self.study_tree.clear()
-
-        studies = self.series_organizer.get_studies_list()
-
-        for study in studies:
-            study_item = QTreeWidgetItem(self.study_tree)
-            study_item.setText(0, str(study))
-            study_item.setData(0, Qt.UserRole, study)
-
-            series_list = study.get_series_list()
-            for series in series_list:
-                series_item = QTreeWidgetItem(study_item)
-                series_item.setText(0, str(series))
-                series_item.setData(0, Qt.UserRole, series)
-
+        """Show the organized studies and series in the tree"""
+        self.study_model.reset()
         self.study_tree.expandAll()
 
-    def on_tree_item_clicked(self, item: QTreeWidgetItem, column: int):
+    def on_tree_item_clicked(self, index: QModelIndex):
         """Handle tree item click"""
-        data = item.data(0, Qt.UserRole)
+        data = index.data(Qt.UserRole)
 
         if isinstance(data, DICOMSeries):
             self.load_series(data)
@@ -322,6 +346,15 @@ class MainWindow(QMainWindow):
         # TODO: Implement database management
         QMessageBox.information(self, "Database", "Database management feature will be implemented.")
 
+    def closeEvent(self, event):
+        """Stop a running load before the window goes away"""
+        if self.ingest_thread is not None:
+            self.ingest_worker.cancel()
+            self.ingest_thread.quit()
+            self.ingest_thread.wait()
+        self.viewer_widget.stop_background_work()
+        super().closeEvent(event)
+
     def show_about(self):
         """Show about dialog"""
         QMessageBox.about(
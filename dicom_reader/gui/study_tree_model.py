@@ -0,0 +1,89 @@
+"""
+Study Tree Model
+Qt item model exposing the organizer's studies and series to a QTreeView
+"""
+
+from PyQt5.QtCore import QAbstractItemModel, QModelIndex, Qt
+from typing import Dict, List
+
+from ..dicom.series_organizer import SeriesOrganizer, DICOMStudy
+
+
+class StudyTreeModel(QAbstractItemModel):
+    """
+    Two-level tree of studies and their series
+
+    Rows are read straight from the organizer; no per-row Qt objects are
+    created. Study indexes have no internal pointer, series indexes point to
+    their study. Call reset() after the organizer changes.
+    """
+
+    def __init__(self, organizer: SeriesOrganizer, parent=None):
+        super().__init__(parent)
+        self.organizer = organizer
+        self._studies: List[DICOMStudy] = []
+        self._study_rows: Dict[int, int] = {}
+
+    def reset(self):
+        """Re-read the studies and series from the organizer"""
+        self.beginResetModel()
+        self._studies = self.organizer.get_studies_list()
+        self._study_rows = {id(study): row for row, study in enumerate(self._studies)}
+        self.endResetModel()
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+
+        if not parent.isValid():
+            return self.createIndex(row, column, None)
+
+        # Series rows carry their study as internal pointer
+        study = self._studies[parent.row()]
+        return self.createIndex(row, column, study)
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+
+        study = index.internalPointer()
+        if study is None:
+            return QModelIndex()
+
+        return self.createIndex(self._study_rows[id(study)], 0, None)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if not parent.isValid():
+            return len(self._studies)
+
+        if parent.internalPointer() is None:
+            return len(self._studies[parent.row()].get_series_list())
+
+        return 0
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        item = self.item(index)
+        if role == Qt.DisplayRole:
+            return str(item)
+        if role == Qt.UserRole:
+            return item
+
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "Studies and Series"
+        return None
+
+    def item(self, index: QModelIndex):
+        """Get the DICOMStudy or DICOMSeries of an index"""
+        study = index.internalPointer()
+        if study is None:
+            return self._studies[index.row()]
+        return study.get_series_list()[index.row()]
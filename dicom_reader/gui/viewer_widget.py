@@ -6,25 +6,312 @@ Displays DICOM images with navigation and manipulation controls
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QPushButton, QSlider, QSpinBox, QGroupBox,
                              QFormLayout, QCheckBox)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QPixmap, QImage
+from PyQt5.QtCore import Qt, QObject, QSize, QTimer, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QPixmap, QPixmapCache, QImage
 import numpy as np
 from PIL import Image
 import logging
+import pydicom
+import threading
 
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from ..dicom.loader import DICOMLoader
 from ..dicom.parser import DICOMParser
 from ..dicom.series_organizer import DICOMSeries
 
 logger = logging.getLogger(__name__)
 
+# Frames rendered ahead of the displayed one, relative to its index
+PREFETCH_OFFSETS = (1, 2, 3, -1)
+
+# Frames rendered ahead from the start of a newly loaded series
+PREFETCH_WARM_FRAMES = 10
+
+# Size of the rendered frame cache (QPixmapCache), in KB
+PIXMAP_CACHE_KB = 128 * 1024
+
+# Idle time after which a frame scaled for speed is scaled again smoothly
+SMOOTH_DELAY_MS = 150
+
+# Window/level slider and resize changes are applied once they have been
+# quiet this long, so a drag renders its final value only
+DISPLAY_DEBOUNCE_MS = 10
+
+# Label size changes up to this many pixels (width plus height) keep frames
+# at the size they are rendered at, instead of rendering them all again
+RESIZE_TOLERANCE_PX = 4
+
+# Decoded pixel arrays are kept for this many frames on each side of the
+# displayed one; the loader's cached datasets further away release theirs
+PIXEL_KEEP_FRAMES = 20
+
+# Largest series whose stored pixel values are preloaded into memory
+PRELOAD_MAX_BYTES = 512 * 1024 * 1024
+
+
+# Per-thread output buffer of the windowing, reused while the frame size
+# stays the same
+_window_buffers = threading.local()
+
+
+def _window_buffer(rows: int, columns: int) -> np.ndarray:
+    """Get this thread's windowing output buffer for a frame size"""
+    buffer = getattr(_window_buffers, 'buffer', None)
+    if buffer is None or buffer.shape != (rows, columns):
+        buffer = _window_buffers.buffer = np.empty((rows, columns), dtype=np.uint8)
+    return buffer
+
+
+def _array_to_qimage(array: np.ndarray) -> QImage:
+    """
+    Wrap a C-contiguous uint8 array in a QImage without copying the pixels
+
+    The QImage borrows the array's buffer: the array has to stay alive as
+    long as the QImage, or any shallow copy of it, is in use.
+    """
+    height, width = array.shape[:2]
+
+    if len(array.shape) == 2:  # Grayscale
+        return QImage(array.data, width, height, width, QImage.Format_Grayscale8)
+    return QImage(array.data, width, height, width * 3, QImage.Format_RGB888)
+
+
+def _frame_info(dataset: pydicom.Dataset) -> Tuple[int, int, object]:
+    """Values the info label shows for a frame: (columns, rows, instance number)"""
+    image_info = DICOMParser.get_image_info(dataset)
+    instance_info = DICOMParser.get_instance_info(dataset)
+    return image_info['columns'], image_info['rows'], instance_info['instance_number']
+
+
+class _SeriesVolume:
+    """
+    Stored pixel values of the frames of a series, in series order
+
+    Filled in by a _VolumePreloadTask while the series is viewed. Frames are
+    written by the preload thread and read by the render threads; a frame
+    is only read once its loaded flag is set.
+    """
+
+    def __init__(self, paths: List[str]):
+        self.paths = list(paths)
+        self.frames: Optional[np.ndarray] = None
+        self.rescale = np.zeros((len(self.paths), 2))
+        self.info: List[Optional[Tuple[int, int, object]]] = [None] * len(self.paths)
+        self.loaded = np.zeros(len(self.paths), dtype=bool)
+        self.cancelled = False
+
+    def frame(self, index: int) -> Optional[Tuple[np.ndarray, float, float, Tuple[int, int, object]]]:
+        """Get (stored values, slope, intercept, info) of a frame, or None if not loaded"""
+        if not self.loaded[index]:
+            return None
+        slope, intercept = self.rescale[index]
+        return self.frames[index], float(slope), float(intercept), self.info[index]
+
+
+class _VolumePreloadTask(QRunnable):
+    """Reads and decodes every frame of a series into its _SeriesVolume"""
+
+    def __init__(self, volume: _SeriesVolume):
+        super().__init__()
+        self.volume = volume
+
+    def run(self):
+        volume = self.volume
+        count = len(volume.paths)
+
+        for index, path in enumerate(volume.paths):
+            if volume.cancelled:
+                return
+
+            try:
+                dataset = pydicom.dcmread(path)
+                frame = dataset.pixel_array
+            except Exception as e:
+                logger.debug(f"Preload of {path} failed: {str(e)}")
+                continue
+
+            if volume.frames is None:
+                if frame.ndim != 2 or frame.nbytes * count > PRELOAD_MAX_BYTES:
+                    logger.info(f"Not preloading {count} frames of {frame.shape} {frame.dtype}")
+                    return
+                volume.frames = np.empty((count,) + frame.shape, dtype=frame.dtype)
+            elif frame.shape != volume.frames.shape[1:] or frame.dtype != volume.frames.dtype:
+                # Left to the renderer, which reads it from its file
+                continue
+
+            volume.frames[index] = frame
+            volume.rescale[index] = DICOMParser._rescale(dataset)
+            volume.info[index] = _frame_info(dataset)
+            volume.loaded[index] = True
+
+            del dataset, frame
+
+
+def _render_frame(loader: DICOMLoader, volume: Optional[_SeriesVolume], index: int, path: str,
+                  window_center: float, window_width: float, target_size: QSize,
+                  smooth: bool) -> Tuple[Optional[QImage], Optional[Tuple[int, int, object]]]:
+    """
+    Window and scale one frame (safe to call off the GUI thread)
+
+    The frame's stored values are taken from the preloaded volume when it
+    has them, otherwise the frame is read from its file.
+
+    Returns:
+        Scaled QImage and the frame's info label values (None, None on failure)
+    """
+    try:
+        preloaded = volume.frame(index) if volume is not None else None
+
+        if preloaded is not None and not smooth:
+            # Frames scaled for speed are windowed at their displayed size
+            values, slope, intercept, info = preloaded
+            size = QSize(values.shape[1], values.shape[0]).scaled(target_size, Qt.KeepAspectRatio)
+            if not size.isEmpty() and (size.height(), size.width()) != values.shape[:2]:
+                image_array = DICOMParser.apply_window_resized(
+                    values, slope, intercept,
+                    window_center,
+                    window_width,
+                    (size.height(), size.width()),
+                    out=_window_buffer(size.height(), size.width())
+                )
+                # Copied off the reused buffer
+                return _array_to_qimage(np.ascontiguousarray(image_array, dtype=np.uint8)).copy(), info
+
+        # The buffer is free again once the frame has been scaled below
+        if preloaded is not None:
+            values, slope, intercept, info = preloaded
+            image_array = DICOMParser.apply_window(
+                values, slope, intercept,
+                window_center,
+                window_width,
+                out=_window_buffer(*values.shape)
+            )
+        else:
+            dataset = loader.read_full(path)
+            if dataset is None:
+                logger.error(f"Could not read image: {path}")
+                return None, None
+
+            info = _frame_info(dataset)
+            image_array = DICOMParser.get_window_level_image(
+                dataset,
+                window_center,
+                window_width,
+                out=_window_buffer(int(dataset.get('Rows', 0) or 0),
+                                   int(dataset.get('Columns', 0) or 0))
+            )
+
+        if image_array is None:
+            logger.error("Could not get image array")
+            return None, None
+
+        image_array = np.ascontiguousarray(image_array, dtype=np.uint8)
+        source = _array_to_qimage(image_array)
+
+        # Scale to fit label while maintaining aspect ratio
+        image = source.scaled(
+            target_size,
+            Qt.KeepAspectRatio,
+            Qt.SmoothTransformation if smooth else Qt.FastTransformation
+        )
+
+        # At the same size scaled() hands back the source, which borrows
+        # image_array
+        if image.size() == source.size():
+            image = image.copy()
+
+        return image, info
+
+    except Exception as e:
+        logger.error(f"Error rendering image: {str(e)}", exc_info=True)
+        return None, None
+
+
+class _RenderSignals(QObject):
+    """Delivers rendered frames from the worker pools to the GUI thread"""
+
+    # generation, index, scaled QImage (None on failure), frame info
+    rendered = pyqtSignal(int, int, object, object)
+
+    # cache key, path, scaled QImage (None on failure or when skipped), frame info
+    prefetched = pyqtSignal(str, str, object, object)
+
+    def __init__(self, parent: QObject):
+        super().__init__(parent)
+        # Cache keys of the frames prefetching is still wanted for; replaced
+        # (never modified) by the GUI thread, read by the prefetch tasks
+        self.wanted: FrozenSet[str] = frozenset()
+
+
+class _FrameRenderJob(QRunnable):
+    """Renders the displayed frame off the GUI thread"""
+
+    def __init__(self, loader: DICOMLoader, volume: Optional[_SeriesVolume], path: str, index: int,
+                 window_center: float, window_width: float, target_size: QSize,
+                 smooth: bool, generation: int, signals: _RenderSignals):
+        super().__init__()
+        self.loader = loader
+        self.volume = volume
+        self.path = path
+        self.index = index
+        self.window_center = window_center
+        self.window_width = window_width
+        self.target_size = target_size
+        self.smooth = smooth
+        self.generation = generation
+        self.signals = signals
+
+    def run(self):
+        image, info = _render_frame(self.loader, self.volume, self.index, self.path,
+                                    self.window_center, self.window_width,
+                                    self.target_size, self.smooth)
+        self.signals.rendered.emit(self.generation, self.index, image, info)
+
+
+class _PrefetchTask(QRunnable):
+    """Renders a frame near the displayed one for the pixmap cache"""
+
+    def __init__(self, loader: DICOMLoader, volume: Optional[_SeriesVolume], path: str, index: int,
+                 key: str, window_center: float, window_width: float, target_size: QSize,
+                 smooth: bool, signals: _RenderSignals):
+        super().__init__()
+        self.loader = loader
+        self.volume = volume
+        self.path = path
+        self.index = index
+        self.key = key
+        self.window_center = window_center
+        self.window_width = window_width
+        self.target_size = target_size
+        self.smooth = smooth
+        self.signals = signals
+
+    def run(self):
+        # Skip frames the viewer has moved away from while this was queued
+        image, info = None, None
+        if self.key in self.signals.wanted:
+            image, info = _render_frame(self.loader, self.volume, self.index, self.path,
+                                        self.window_center, self.window_width,
+                                        self.target_size, self.smooth)
+        self.signals.prefetched.emit(self.key, self.path, image, info)
+
 
 class ViewerWidget(QWidget):
     """Widget for displaying DICOM images"""
 
     image_changed = pyqtSignal(int)
 
-    def __init__(self):
+    def __init__(self, loader: Optional[DICOMLoader] = None):
+        """
+        Initialize the viewer
+
+        Args:
+            loader: Loader used to read the displayed instances (shares its
+                    dataset cache); a private one is created if None
+        """
         super().__init__()
+        self.loader = loader if loader is not None else DICOMLoader()
         self.current_series = None
         self.current_index = 0
         self.current_image = None
@@ -39,6 +326,56 @@ class ViewerWidget(QWidget):
         self.cine_fps = 10
         self.is_playing = False
 
+        # Frames are rendered one at a time off the GUI thread; a request
+        # made while a frame is rendering waits, and only the newest one
+        # is rendered next (see display_current_image)
+        self.render_pool = QThreadPool()
+        self.render_pool.setMaxThreadCount(1)
+        self._render_signals = _RenderSignals(self)
+        self._render_signals.rendered.connect(self.on_frame_rendered)
+        self._render_generation = 0
+        self._render_running = False
+        self._render_pending = False
+        self._render_path = None
+        self._render_key = None
+
+        # Frames are first scaled for speed; once navigation pauses for
+        # SMOOTH_DELAY_MS (and cine is not playing) the displayed one is
+        # scaled again smoothly
+        self._smooth_timer = QTimer(self)
+        self._smooth_timer.setSingleShot(True)
+        self._smooth_timer.setInterval(SMOOTH_DELAY_MS)
+        self._smooth_timer.timeout.connect(self.smooth_current_image)
+
+        # Pending window/level and size changes (see DISPLAY_DEBOUNCE_MS)
+        self._display_timer = QTimer(self)
+        self._display_timer.setSingleShot(True)
+        self._display_timer.setInterval(DISPLAY_DEBOUNCE_MS)
+        self._display_timer.timeout.connect(self.apply_pending_display)
+        self._window_pending = False
+        self._resize_pending = False
+
+        # Size frames are rendered to fit (the label size, see RESIZE_TOLERANCE_PX)
+        self._display_size = QSize()
+
+        # Background renders of the frames around the displayed one, by
+        # cache key of the frames submitted and not reported back yet
+        self.prefetch_pool = QThreadPool()
+        self.prefetch_pool.setMaxThreadCount(2)
+        self._render_signals.prefetched.connect(self.on_frame_prefetched)
+        self._prefetching: Set[str] = set()
+
+        # Stored pixel values of the current series, decoded in the
+        # background so frames can be rendered without reading their files
+        self.preload_pool = QThreadPool()
+        self.preload_pool.setMaxThreadCount(1)
+        self._volume: Optional[_SeriesVolume] = None
+
+        # Rendered frames are kept in QPixmapCache (see _frame_key); the
+        # info label values of each rendered file are kept alongside
+        QPixmapCache.setCacheLimit(PIXMAP_CACHE_KB)
+        self._frame_info: Dict[str, Tuple[int, int, object]] = {}
+
         self.init_ui()
 
     def init_ui(self):
@@ -186,83 +523,247 @@ class ViewerWidget(QWidget):
         """Load a DICOM series"""
         self.current_series = series
         self.current_index = 0
+        QPixmapCache.clear()
+        self._frame_info.clear()
+        self._display_size = self.image_label.size()
+
+        if self._volume is not None:
+            self._volume.cancelled = True
+        self._volume = None
+        if series.get_instance_count() > 1:
+            self._volume = _SeriesVolume(series.paths)
+            self.preload_pool.start(_VolumePreloadTask(self._volume))
 
         if series.get_instance_count() > 0:
             self.image_slider.setMaximum(series.get_instance_count() - 1)
             self.image_slider.setValue(0)
             self.display_current_image()
+
+            # Warm the cache for playback from the start
+            if self.window_center is not None and self.window_width is not None:
+                self.prefetch_frames(range(1, min(series.get_instance_count(), PREFETCH_WARM_FRAMES)))
         else:
             self.clear_display()
 
     def display_current_image(self):
-        """Display the current image"""
+        """Render the current image in the background and show it when done"""
         if not self.current_series or self.current_index >= self.current_series.get_instance_count():
             return
 
-        try:
-            dataset = self.current_series.datasets[self.current_index]
-
-            # Get window/level values if not set
-            if self.window_center is None or self.window_width is None:
-                self.reset_window_level()
-
-            # Get windowed image
-            image_array = DICOMParser.get_window_level_image(
-                dataset,
-                self.window_center,
-                self.window_width
-            )
+        # Get window/level values if not set (displays the image again)
+        if self.window_center is None or self.window_width is None:
+            self.reset_window_level()
+            return
 
-            if image_array is None:
-                logger.error("Could not get image array")
-                return
+        self._render_generation += 1
 
-            # Convert to QPixmap
-            pixmap = self.array_to_pixmap(image_array)
+        # Frames already rendered with these settings are shown right away
+        pixmap = self._cached_frame(self.current_index, smooth=True)
+        if pixmap is not None:
+            self._render_pending = False
+            self._smooth_timer.stop()
+            self._show_frame(self.current_index, pixmap)
+        else:
+            pixmap = self._cached_frame(self.current_index, smooth=False)
+            if pixmap is not None:
+                self._render_pending = False
+                self._show_frame(self.current_index, pixmap)
+            elif self._render_running:
+                self._render_pending = True
+            else:
+                self._start_render(smooth=False)
 
-            # Scale to fit label while maintaining aspect ratio
-            scaled_pixmap = pixmap.scaled(
-                self.image_label.size(),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
+            if not self.is_playing:
+                self._smooth_timer.start()
 
-            self.image_label.setPixmap(scaled_pixmap)
+        self.prefetch_neighbours()
+        self.release_far_frames()
 
-            # Update info
-            instance_info = DICOMParser.get_instance_info(dataset)
-            image_info = DICOMParser.get_image_info(dataset)
+    def smooth_current_image(self):
+        """Show the current image scaled smoothly"""
+        if self.is_playing or not self.current_series:
+            return
+        if self.current_index >= self.current_series.get_instance_count():
+            return
 
-            info_text = (f"Image {self.current_index + 1} of {self.current_series.get_instance_count()} | "
-                        f"Size: {image_info['columns']}x{image_info['rows']} | "
-                        f"Instance: {instance_info['instance_number']}")
+        pixmap = self._cached_frame(self.current_index, smooth=True)
+        if pixmap is not None:
+            self._show_frame(self.current_index, pixmap)
+        elif self._render_running:
+            # Try again once the frame being rendered is done
+            self._smooth_timer.start()
+        else:
+            self._start_render(smooth=True)
+
+    def _frame_key(self, index: int, smooth: bool) -> str:
+        """Key of a frame rendered with the current window/level and display size"""
+        size = self._display_size
+        return (f"{self.current_series.paths[index]}|{self.window_center}|{self.window_width}|"
+                f"{size.width()}x{size.height()}|{'smooth' if smooth else 'fast'}")
+
+    def _cached_frame(self, index: int, smooth: bool) -> Optional[QPixmap]:
+        """Get a frame of the current series from the pixmap cache (None if not cached)"""
+        pixmap = QPixmapCache.find(self._frame_key(index, smooth))
+        if pixmap is None or pixmap.isNull() or self.current_series.paths[index] not in self._frame_info:
+            return None
+        return pixmap
+
+    def _start_render(self, smooth: bool = False):
+        """Render the current image with the current window/level"""
+        self._render_pending = False
+        if not self.current_series or self.current_index >= self.current_series.get_instance_count():
+            return
 
-            self.info_label.setText(info_text)
+        self._render_running = True
+        self._render_path = self.current_series.paths[self.current_index]
+        self._render_key = self._frame_key(self.current_index, smooth)
+        self.render_pool.start(_FrameRenderJob(
+            self.loader,
+            self._volume,
+            self._render_path,
+            self.current_index,
+            self.window_center,
+            self.window_width,
+            self._display_size,
+            smooth,
+            self._render_generation,
+            self._render_signals
+        ))
+
+    def on_frame_rendered(self, generation: int, index: int, image: Optional[QImage], info):
+        """Cache a rendered frame and show it unless a newer one has been requested"""
+        self._render_running = False
+
+        pixmap = None
+        if image is not None:
+            pixmap = self._cache_frame(self._render_key, self._render_path, image, info)
+
+        if self._render_pending:
+            self._start_render()
+            return
 
-            self.image_changed.emit(self.current_index)
+        if generation != self._render_generation or pixmap is None:
+            return
 
-        except Exception as e:
-            logger.error(f"Error displaying image: {str(e)}", exc_info=True)
+        self._show_frame(index, pixmap)
+
+    def _cache_frame(self, key: str, path: str, image: QImage,
+                     info: Tuple[int, int, object]) -> QPixmap:
+        """Put a rendered frame into the pixmap cache; returns its pixmap"""
+        pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(key, pixmap)
+        self._frame_info[path] = info
+        return pixmap
+
+    def _show_frame(self, index: int, pixmap: QPixmap):
+        """Show a rendered frame and its info"""
+        self.image_label.setPixmap(pixmap)
+
+        # Update info
+        columns, rows, instance_number = self._frame_info[self.current_series.paths[index]]
+        info_text = (f"Image {index + 1} of {self.current_series.get_instance_count()} | "
+                    f"Size: {columns}x{rows} | "
+                    f"Instance: {instance_number}")
+
+        self.info_label.setText(info_text)
+
+        self.image_changed.emit(index)
+
+    def get_current_dataset(self):
+        """Read the full dataset of the current instance (None if unreadable)"""
+        path = self.current_series.paths[self.current_index]
+        dataset = self.loader.read_full(path)
+        if dataset is None:
+            logger.error(f"Could not read image: {path}")
+        return dataset
+
+    def prefetch_neighbours(self):
+        """Render the frames around the current one in the background"""
+        count = self.current_series.get_instance_count()
+        wrap = self.is_playing and self.loop_checkbox.isChecked()
+
+        indices = []
+        for offset in PREFETCH_OFFSETS:
+            index = self.current_index + offset
+            if wrap:
+                index %= count
+            if 0 <= index < count:
+                indices.append(index)
+
+        self.prefetch_frames(indices)
+
+    def release_far_frames(self):
+        """Free the decoded pixels of frames more than PIXEL_KEEP_FRAMES away"""
+        start = max(0, self.current_index - PIXEL_KEEP_FRAMES)
+        keep = self.current_series.paths[start:self.current_index + PIXEL_KEEP_FRAMES + 1]
+        self.loader.release_pixel_arrays(keep)
+
+    def prefetch_frames(self, indices: Iterable[int]):
+        """
+        Render frames of the current series into the pixmap cache
+
+        Frames asked for by an earlier call and not started yet are skipped.
+
+        Args:
+            indices: Indices of the frames, most wanted first
+        """
+        # Cine shows frames scaled for speed; otherwise they stay on screen
+        smooth = not self.is_playing
+
+        keys = {}
+        for index in indices:
+            key = self._frame_key(index, smooth)
+            pixmap = QPixmapCache.find(key)
+            if pixmap is None or pixmap.isNull():
+                keys[key] = index
+
+        self._render_signals.wanted = frozenset(keys)
+
+        for key, index in keys.items():
+            if key in self._prefetching:
+                continue
+            self._prefetching.add(key)
+            self.prefetch_pool.start(_PrefetchTask(
+                self.loader,
+                self._volume,
+                self.current_series.paths[index],
+                index,
+                key,
+                self.window_center,
+                self.window_width,
+                self._display_size,
+                smooth,
+                self._render_signals
+            ))
+
+    def on_frame_prefetched(self, key: str, path: str, image: Optional[QImage], info):
+        """Cache a frame rendered ahead"""
+        self._prefetching.discard(key)
+        if image is not None:
+            self._cache_frame(key, path, image, info)
 
     def array_to_pixmap(self, array: np.ndarray) -> QPixmap:
         """Convert numpy array to QPixmap"""
-        # Ensure array is uint8
-        if array.dtype != np.uint8:
-            array = array.astype(np.uint8)
-
-        height, width = array.shape
-        bytes_per_line = width
-
-        # Create QImage
-        if len(array.shape) == 2:  # Grayscale
-            qimage = QImage(array.data, width, height, bytes_per_line, QImage.Format_Grayscale8)
-        else:
-            qimage = QImage(array.data, width, height, bytes_per_line, QImage.Format_RGB888)
-
-        return QPixmap.fromImage(qimage)
+        # No copy when the array is already contiguous uint8; fromImage
+        # copies the pixels, so the array only has to outlive this call
+        array = np.ascontiguousarray(array, dtype=np.uint8)
+        return QPixmap.fromImage(_array_to_qimage(array))
+
+    def stop_background_work(self):
+        """Stop preloading and prefetching and wait for running renders"""
+        if self._volume is not None:
+            self._volume.cancelled = True
+        self._render_signals.wanted = frozenset()
+        self._smooth_timer.stop()
+        for pool in (self.preload_pool, self.prefetch_pool, self.render_pool):
+            pool.waitForDone()
 
     def clear_display(self):
         """Clear the image display"""
+        # Drop frames still being rendered
+        self._render_generation += 1
+        self._render_pending = False
+        self._smooth_timer.stop()
         self.image_label.clear()
         self.image_label.setText("No image to display")
         self.info_label.setText("No image loaded")
@@ -307,39 +808,66 @@ class ViewerWidget(QWidget):
             self.set_current_index(self.current_series.get_instance_count() - 1)
 
     def on_window_changed(self):
-        """Handle window/level change"""
-        self.window_center = self.wc_slider.value()
-        self.window_width = self.ww_slider.value()
-        self.display_current_image()
+        """Handle window/level change (applied once the sliders settle)"""
+        self._window_pending = True
+        self._display_timer.start()
+
+    def apply_pending_display(self):
+        """Redisplay for the window/level and size changes made since the last call"""
+        changed = False
+        if self._resize_pending:
+            self._resize_pending = False
+            size = self.image_label.size()
+            if (abs(size.width() - self._display_size.width())
+                    + abs(size.height() - self._display_size.height())) > RESIZE_TOLERANCE_PX:
+                self._display_size = size
+                changed = True
+
+        if self._window_pending:
+            self._window_pending = False
+            window = (self.wc_slider.value(), self.ww_slider.value())
+            if window != (self.window_center, self.window_width):
+                self.window_center, self.window_width = window
+                changed = True
+
+        if changed:
+            self.display_current_image()
 
     def reset_window_level(self):
         """Reset window/level to default values"""
         if self.current_series and self.current_index < self.current_series.get_instance_count():
-            dataset = self.current_series.datasets[self.current_index]
+            dataset = self.get_current_dataset()
+            if dataset is None:
+                return
 
-            # Get default window center and width
-            wc = dataset.get('WindowCenter', None)
-            ww = dataset.get('WindowWidth', None)
+            try:
+                # Get default window center and width
+                wc = dataset.get('WindowCenter', None)
+                ww = dataset.get('WindowWidth', None)
 
-            if wc is not None:
-                self.window_center = float(wc[0]) if isinstance(wc, (list, tuple)) else float(wc)
-            else:
-                # Use pixel array statistics
-                pixel_array = DICOMParser.get_pixel_array(dataset)
-                if pixel_array is not None:
-                    self.window_center = (pixel_array.max() + pixel_array.min()) / 2
+                if wc is not None:
+                    self.window_center = DICOMParser._first_value(wc)
                 else:
-                    self.window_center = 0
-
-            if ww is not None:
-                self.window_width = float(ww[0]) if isinstance(ww, (list, tuple)) else float(ww)
-            else:
-                # Use pixel array statistics
-                pixel_array = DICOMParser.get_pixel_array(dataset)
-                if pixel_array is not None:
-                    self.window_width = pixel_array.max() - pixel_array.min()
+                    # Use pixel array statistics
+                    pixel_array = DICOMParser.get_pixel_array(dataset)
+                    if pixel_array is not None:
+                        self.window_center = (pixel_array.max() + pixel_array.min()) / 2
+                    else:
+                        self.window_center = 0
+
+                if ww is not None:
+                    self.window_width = DICOMParser._first_value(ww)
                 else:
-                    self.window_width = 400
+                    # Use pixel array statistics
+                    pixel_array = DICOMParser.get_pixel_array(dataset)
+                    if pixel_array is not None:
+                        self.window_width = pixel_array.max() - pixel_array.min()
+                    else:
+                        self.window_width = 400
+
+            except Exception as e:
+                logger.error(f"Error resetting window/level: {str(e)}", exc_info=True)
+                return
 
             # Update sliders
             self.wc_slider.setValue(int(self.window_center))
@@ -367,6 +895,7 @@ class ViewerWidget(QWidget):
         self.is_playing = False
         self.play_btn.setText("Play")
         self.cine_timer.stop()
+        self._smooth_timer.start()
 
     def on_fps_changed(self, fps: int):
         """Handle FPS change"""
@@ -380,4 +909,5 @@ class ViewerWidget(QWidget):
         super().resizeEvent(event)
         # Redisplay image to scale it properly
         if self.current_series:
-            self.display_current_image()
+            self._resize_pending = True
+            self._display_timer.start()
@@ -3,18 +3,188 @@
 Performs 3D volume reconstruction and rendering from DICOM series
 """
 
+import hashlib
 import numpy as np
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from scipy import ndimage
 import vtk
 from vtk.util import numpy_support
 import logging
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from ..dicom.series_organizer import DICOMSeries
+from ..dicom._kernels import NUMBA_AVAILABLE, sample_plane
+from ..dicom.loader import DICOMLoader
 from ..dicom.parser import DICOMParser
+from ..dicom.series_organizer import DICOMSeries
+from ..utils.config import Config
 
 logger = logging.getLogger(__name__)
 
 
+# Integer tags of the elements read by VolumeReconstructor._extract_spacing
+_PIXEL_SPACING = 0x00280030
+_SLICE_THICKNESS = 0x00180050
+_IMAGE_POSITION = 0x00200032
+
+
+def _element_value(dataset, tag: int, default):
+    """Value of the element with an integer tag (default if absent or empty)"""
+    element = dataset.get(tag)
+    if element is None or element.value is None or element.value == '':
+        return default
+    return element.value
+
+
+# Rendering presets: name -> (color points (value, r, g, b), opacity points (value, opacity))
+TRANSFER_PRESETS = {
+    'bone': (
+        ((-3024, 0, 0, 0), (-16, 0.73, 0.25, 0.30), (641, 0.90, 0.82, 0.56), (3071, 1, 1, 1)),
+        ((-3024, 0), (-16, 0), (641, 0.72), (3071, 0.72))
+    ),
+    'soft_tissue': (
+        ((-3024, 0, 0, 0), (-1000, 0.62, 0.36, 0.18), (-500, 0.88, 0.60, 0.29), (3071, 0.83, 0.66, 1)),
+        ((-3024, 0), (-1000, 0), (-500, 1.0), (3071, 1.0))
+    )
+}
+
+
+def _filled(function, points):
+    """
+    Set all points of a transfer function in one call
+
+    Args:
+        function: vtkColorTransferFunction ((value, r, g, b) points) or
+            vtkPiecewiseFunction ((value, y) points)
+        points: Points in increasing value order
+
+    Returns:
+        The function
+    """
+    table = np.asarray(points, dtype=np.float64)
+    function.FillFromDataPointer(len(table), table.ravel())
+    return function
+
+
+@lru_cache(maxsize=None)
+def _preset_transfer_functions(name: str) -> Tuple[vtk.vtkColorTransferFunction, vtk.vtkPiecewiseFunction]:
+    """Build the (color, opacity) functions of a preset once; renderers share them"""
+    color_points, opacity_points = TRANSFER_PRESETS[name]
+    return (_filled(vtk.vtkColorTransferFunction(), color_points),
+            _filled(vtk.vtkPiecewiseFunction(), opacity_points))
+
+
+@lru_cache(maxsize=8)
+def _default_transfer_functions(low: float, high: float) -> Tuple[vtk.vtkColorTransferFunction,
+                                                                 vtk.vtkPiecewiseFunction,
+                                                                 vtk.vtkPiecewiseFunction]:
+    """Build the default (color, opacity, gradient opacity) functions of a scalar range"""
+    # Color transfer function (grayscale)
+    color_func = _filled(vtk.vtkColorTransferFunction(), ((low, 0.0, 0.0, 0.0), (high, 1.0, 1.0, 1.0)))
+
+    # Opacity transfer function
+    opacity_func = _filled(vtk.vtkPiecewiseFunction(), (
+        (low, 0.0),
+        (low + (high - low) * 0.2, 0.0),
+        (low + (high - low) * 0.5, 0.5),
+        (high, 1.0)
+    ))
+
+    # Gradient opacity
+    gradient_func = _filled(vtk.vtkPiecewiseFunction(), ((0, 0.0), (90, 0.5), (100, 1.0)))
+
+    return color_func, opacity_func, gradient_func
+
+
+def _volume_dtype(dataset) -> type:
+    """
+    Smallest volume dtype holding the rescaled values of a series
+
+    int16 (or uint16) when the first slice's rescale is integral and maps
+    its whole stored range (from Bits Stored) into that type, as for CT and
+    most MR; float32 otherwise.
+    """
+    if dataset is None:
+        return np.float32
+
+    bits = int(dataset.get('BitsStored', 0) or 0)
+    if not 0 < bits <= 16 or int(dataset.get('SamplesPerPixel', 1) or 1) != 1:
+        return np.float32
+
+    slope, intercept = DICOMParser._rescale(dataset)
+    if slope != int(slope) or intercept != int(intercept):
+        return np.float32
+
+    if dataset.get('PixelRepresentation', 0) == 1:
+        stored = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1)
+    else:
+        stored = (0, (1 << bits) - 1)
+    low, high = sorted(value * slope + intercept for value in stored)
+
+    for dtype in (np.int16, np.uint16):
+        limits = np.iinfo(dtype)
+        if limits.min <= low and high <= limits.max:
+            return dtype
+    return np.float32
+
+
+def _volume_cache_path(series: DICOMSeries, dtype) -> Optional[Path]:
+    """
+    Cache file of a series volume
+
+    Named by a hash of the series UID, the volume dtype and the path, size
+    and modification time of each file in series order, so a changed or
+    re-sorted series gets a new file. None if a file cannot be checked.
+    """
+    digest = hashlib.sha1(f"{series.series_instance_uid}|{np.dtype(dtype).str}".encode())
+    try:
+        for path in series.paths:
+            stat = os.stat(path)
+            digest.update(f"|{path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    except OSError:
+        return None
+    return Config.VOLUME_CACHE_DIR / f"{digest.hexdigest()}.npy"
+
+
+def _load_cached_volume(path: Optional[Path]) -> Optional[np.ndarray]:
+    """Memory-map a cached volume read-only (None if not cached)"""
+    if path is None or not path.exists():
+        return None
+    try:
+        volume = np.load(path, mmap_mode='r')
+        os.utime(path)  # Most recently used; see _save_cached_volume
+        return volume
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read cached volume {path}: {str(e)}")
+        return None
+
+
+def _save_cached_volume(path: Path, volume: np.ndarray):
+    """Add a volume to the cache, deleting the least recently used ones beyond VOLUME_CACHE_MAX_BYTES"""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written under another name first, so a partial file is never loaded
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'wb') as f:
+            np.save(f, volume)
+        os.replace(temp_path, path)
+
+        files = [(f.stat().st_mtime, f.stat().st_size, f) for f in path.parent.glob('*.npy')]
+        total = sum(size for _, size, _ in files)
+        for _, size, f in sorted(files):
+            if total <= Config.VOLUME_CACHE_MAX_BYTES:
+                break
+            if f != path:
+                f.unlink()
+                total -= size
+
+    except OSError as e:
+        logger.warning(f"Could not cache volume: {str(e)}")
+
+
 class VolumeReconstructor:
     """Handles 3D volume reconstruction from DICOM series"""
 
@@ -24,12 +194,19 @@ class VolumeReconstructor:
         self.spacing = (1.0, 1.0, 1.0)
         self.origin = (0.0, 0.0, 0.0)
 
-    def reconstruct_from_series(self, series: DICOMSeries) -> bool:
+    def reconstruct_from_series(self, series: DICOMSeries,
+                                loader: Optional[DICOMLoader] = None) -> bool:
         """
         Reconstruct 3D volume from a DICOM series
 
+        Volumes are cached on disk (Config.VOLUME_CACHE_DIR); a series read
+        before is memory-mapped read-only from its cache file instead of
+        being decoded again.
+
         Args:
             series: DICOMSeries object containing the images
+            loader: Loader used to read the spacing of the first slice (a new
+                    one if None)
 
         Returns:
             True if reconstruction was successful
@@ -42,22 +219,24 @@ class VolumeReconstructor:
             # Sort instances
             series.sort_instances()
 
-            # Get all pixel arrays
-            slices = []
-            for dataset in series.datasets:
-                pixel_array = DICOMParser.get_pixel_array(dataset)
-                if pixel_array is not None:
-                    slices.append(pixel_array)
-
-            if not slices:
-                logger.error("No valid pixel data found")
-                return False
-
-            # Stack slices into 3D volume
-            self.volume_data = np.stack(slices, axis=0)
+            if loader is None:
+                loader = DICOMLoader()
+            first_dataset = loader.load_metadata(series.paths[0])
+
+            # Read all slices into one volume, unless the series was read before
+            dtype = _volume_dtype(first_dataset)
+            cache_path = _volume_cache_path(series, dtype)
+            self.volume_data = _load_cached_volume(cache_path)
+            if self.volume_data is None:
+                self.volume_data = series.as_volume(dtype, rescale=True)
+                if self.volume_data is None:
+                    logger.error("No valid pixel data found")
+                    return False
+                if cache_path is not None:
+                    _save_cached_volume(cache_path, self.volume_data)
 
             # Get spacing information
-            self._extract_spacing(series.datasets[0])
+            self._extract_spacing(first_dataset)
 
             # Create VTK image data
             self._create_vtk_image_data()
@@ -70,22 +249,22 @@ class VolumeReconstructor:
             return False
 
     def _extract_spacing(self, dataset):
-        """Extract voxel spacing from DICOM dataset"""
+        """Extract voxel spacing from DICOM dataset (elements read by integer tag)"""
         try:
             # Get pixel spacing (row, column)
-            pixel_spacing = dataset.get('PixelSpacing', [1.0, 1.0])
+            pixel_spacing = _element_value(dataset, _PIXEL_SPACING, [1.0, 1.0])
             row_spacing = float(pixel_spacing[0])
             col_spacing = float(pixel_spacing[1])
 
             # Get slice thickness
-            slice_thickness = float(dataset.get('SliceThickness', 1.0))
+            slice_thickness = float(_element_value(dataset, _SLICE_THICKNESS, 1.0))
 
             # VTK uses (x, y, z) ordering
             self.spacing = (col_spacing, row_spacing, slice_thickness)
 
             # Get image position
-            image_position = dataset.get('ImagePositionPatient', [0.0, 0.0, 0.0])
-            self.origin = tuple(float(x) for x in image_position)
+            image_position = _element_value(dataset, _IMAGE_POSITION, [0.0, 0.0, 0.0])
+            self.origin = (float(image_position[0]), float(image_position[1]), float(image_position[2]))
 
         except Exception as e:
             logger.warning(f"Could not extract spacing info: {str(e)}")
@@ -94,11 +273,14 @@ class VolumeReconstructor:
 
     def _create_vtk_image_data(self):
         """Create VTK image data from numpy array"""
-        # Convert numpy array to VTK array
+        # The VTK array shares the volume's memory instead of copying it
+        # (numpy_to_vtk keeps a reference to the numpy array alive); as_volume
+        # already gives a C-contiguous volume, so nothing is converted here
+        self.volume_data = np.ascontiguousarray(self.volume_data)
         vtk_array = numpy_support.numpy_to_vtk(
-            self.volume_data.ravel(),
-            deep=True,
-            array_type=vtk.VTK_FLOAT
+            self.volume_data.reshape(-1),
+            deep=False,
+            array_type=numpy_support.get_vtk_array_type(self.volume_data.dtype)
         )
 
         # Create VTK image data
@@ -129,10 +311,11 @@ class VolumeRenderer:
     def __init__(self):
         self.renderer = vtk.vtkRenderer()
         self.render_window = vtk.vtkRenderWindow()
-        self.interactor = vtk.vtkRenderWindowInteractor()
-
         self.render_window.AddRenderer(self.renderer)
-        self.interactor.SetRenderWindow(self.render_window)
+
+        # Created by start_interaction; a window embedded in Qt gets its
+        # interactor from Qt instead
+        self.interactor = None
 
         # Volume properties
         self.volume = None
@@ -146,8 +329,13 @@ class VolumeRenderer:
         Args:
             image_data: VTK image data to render
         """
-        # Create volume mapper
-        self.volume_mapper = vtk.vtkGPUVolumeRayCastMapper()
+        # Create volume mapper: GPU ray casting, falling back to the CPU ray
+        # cast mapper when the GPU cannot render the volume (the explicit GPU
+        # render mode would render nothing instead)
+        self.volume_mapper = vtk.vtkSmartVolumeMapper()
+        self.volume_mapper.SetRequestedRenderModeToDefault()
+        self.volume_mapper.SetAutoAdjustSampleDistances(1)
+        self.volume_mapper.SetBlendModeToComposite()
         self.volume_mapper.SetInputData(image_data)
 
         # Create volume property
@@ -173,24 +361,7 @@ class VolumeRenderer:
         # Get scalar range
         scalar_range = image_data.GetScalarRange()
 
-        # Color transfer function (grayscale)
-        color_func = vtk.vtkColorTransferFunction()
-        color_func.AddRGBPoint(scalar_range[0], 0.0, 0.0, 0.0)
-        color_func.AddRGBPoint(scalar_range[1], 1.0, 1.0, 1.0)
-
-        # Opacity transfer function
-        opacity_func = vtk.vtkPiecewiseFunction()
-        opacity_func.AddPoint(scalar_range[0], 0.0)
-        opacity_func.AddPoint(scalar_range[0] + (scalar_range[1] - scalar_range[0]) * 0.2, 0.0)
-        opacity_func.AddPoint(scalar_range[0] + (scalar_range[1] - scalar_range[0]) * 0.5, 0.5)
-        opacity_func.AddPoint(scalar_range[1], 1.0)
-
-        # Gradient opacity
-        gradient_func = vtk.vtkPiecewiseFunction()
-        gradient_func.AddPoint(0, 0.0)
-        gradient_func.AddPoint(90, 0.5)
-        gradient_func.AddPoint(100, 1.0)
-
+        color_func, opacity_func, gradient_func = _default_transfer_functions(*scalar_range)
         self.volume_property.SetColor(color_func)
         self.volume_property.SetScalarOpacity(opacity_func)
         self.volume_property.SetGradientOpacity(gradient_func)
@@ -200,18 +371,7 @@ class VolumeRenderer:
         if self.volume_property is None:
             return
 
-        color_func = vtk.vtkColorTransferFunction()
-        color_func.AddRGBPoint(-3024, 0, 0, 0)
-        color_func.AddRGBPoint(-16, 0.73, 0.25, 0.30)
-        color_func.AddRGBPoint(641, 0.90, 0.82, 0.56)
-        color_func.AddRGBPoint(3071, 1, 1, 1)
-
-        opacity_func = vtk.vtkPiecewiseFunction()
-        opacity_func.AddPoint(-3024, 0)
-        opacity_func.AddPoint(-16, 0)
-        opacity_func.AddPoint(641, 0.72)
-        opacity_func.AddPoint(3071, 0.72)
-
+        color_func, opacity_func = _preset_transfer_functions('bone')
         self.volume_property.SetColor(color_func)
         self.volume_property.SetScalarOpacity(opacity_func)
 
@@ -220,18 +380,7 @@ class VolumeRenderer:
         if self.volume_property is None:
             return
 
-        color_func = vtk.vtkColorTransferFunction()
-        color_func.AddRGBPoint(-3024, 0, 0, 0)
-        color_func.AddRGBPoint(-1000, 0.62, 0.36, 0.18)
-        color_func.AddRGBPoint(-500, 0.88, 0.60, 0.29)
-        color_func.AddRGBPoint(3071, 0.83, 0.66, 1)
-
-        opacity_func = vtk.vtkPiecewiseFunction()
-        opacity_func.AddPoint(-3024, 0)
-        opacity_func.AddPoint(-1000, 0)
-        opacity_func.AddPoint(-500, 1.0)
-        opacity_func.AddPoint(3071, 1.0)
-
+        color_func, opacity_func = _preset_transfer_functions('soft_tissue')
         self.volume_property.SetColor(color_func)
         self.volume_property.SetScalarOpacity(opacity_func)
 
@@ -249,9 +398,18 @@ class VolumeRenderer:
         """Render the volume"""
         self.render_window.Render()
 
+    def _ensure_interactor(self) -> vtk.vtkRenderWindowInteractor:
+        """Get the interactor of the render window, creating one if it has none"""
+        if self.interactor is None:
+            self.interactor = self.render_window.GetInteractor()
+            if self.interactor is None:
+                self.interactor = vtk.vtkRenderWindowInteractor()
+                self.interactor.SetRenderWindow(self.render_window)
+        return self.interactor
+
     def start_interaction(self):
         """Start the interactive viewer"""
-        self.interactor.Start()
+        self._ensure_interactor().Start()
 
     def get_render_window(self) -> vtk.vtkRenderWindow:
         """Get the render window for embedding in Qt"""
@@ -261,42 +419,141 @@ class VolumeRenderer:
 class MPRReconstructor:
     """Multi-Planar Reconstruction for creating orthogonal views"""
 
-    def __init__(self, volume_data: np.ndarray):
+    def __init__(self, volume_data: np.ndarray, cache_bytes: Optional[int] = None):
+        """
+        Initialize the reconstructor
+
+        Args:
+            volume_data: (z, y, x) volume
+            cache_bytes: Memory allowed for the contiguous copies that make
+                         coronal and sagittal slices contiguous (twice the
+                         volume size, i.e. both copies, if None)
+        """
         self.volume_data = volume_data
+        self.cache_bytes = 2 * volume_data.nbytes if cache_bytes is None else cache_bytes
+
+        # Contiguous copies of the volume by axis order, least recently used first
+        self._transposes: "OrderedDict[Tuple[int, int, int], np.ndarray]" = OrderedDict()
+
+        # uint8 display buffer of each view, reused by the *_windowed methods
+        self._display_buffers: Dict[str, np.ndarray] = {}
+
+    def _transposed(self, axes: Tuple[int, int, int]) -> np.ndarray:
+        """
+        Get the volume with its axes in the given order
+
+        A contiguous copy is made on first use and kept within cache_bytes,
+        dropping the least recently used copy when needed; if the volume is
+        larger than cache_bytes, a strided view is returned instead.
+        """
+        volume = self._transposes.get(axes)
+        if volume is not None:
+            self._transposes.move_to_end(axes)
+            return volume
+
+        if self.volume_data.nbytes > self.cache_bytes:
+            return self.volume_data.transpose(axes)
+
+        while self._transposes and (sum(cached.nbytes for cached in self._transposes.values())
+                                    + self.volume_data.nbytes > self.cache_bytes):
+            self._transposes.popitem(last=False)
+
+        volume = self._transposes[axes] = np.ascontiguousarray(self.volume_data.transpose(axes))
+        return volume
 
     def get_axial_slice(self, z_index: int) -> Optional[np.ndarray]:
-        """Get axial slice at given z index"""
+        """Get axial slice at given z index (a view of the volume)"""
         if 0 <= z_index < self.volume_data.shape[0]:
             return self.volume_data[z_index, :, :]
         return None
 
     def get_coronal_slice(self, y_index: int) -> Optional[np.ndarray]:
-        """Get coronal slice at given y index"""
+        """Get coronal slice at given y index (a (z, x) view, contiguous within cache_bytes)"""
         if 0 <= y_index < self.volume_data.shape[1]:
-            return self.volume_data[:, y_index, :]
+            return self._transposed((1, 0, 2))[y_index]
         return None
 
     def get_sagittal_slice(self, x_index: int) -> Optional[np.ndarray]:
-        """Get sagittal slice at given x index"""
+        """Get sagittal slice at given x index (a (z, y) view, contiguous within cache_bytes)"""
         if 0 <= x_index < self.volume_data.shape[2]:
-            return self.volume_data[:, :, x_index]
+            return self._transposed((2, 0, 1))[x_index]
         return None
 
+    def _windowed(self, view: str, image: Optional[np.ndarray],
+                  window_center: float, window_width: float) -> Optional[np.ndarray]:
+        """Window a slice into the display buffer of its view (None if image is None)"""
+        if image is None:
+            return None
+
+        # The fused 16-bit path of apply_window needs a contiguous slice
+        if image.dtype in (np.int16, np.uint16):
+            image = np.ascontiguousarray(image)
+
+        out = self._display_buffers.get(view)
+        if out is None or out.shape != image.shape:
+            out = self._display_buffers[view] = np.empty(image.shape, dtype=np.uint8)
+        return DICOMParser.apply_window(image, 1.0, 0.0, window_center, window_width, out=out)
+
+    def get_axial_slice_windowed(self, z_index: int, window_center: float,
+                                 window_width: float) -> Optional[np.ndarray]:
+        """
+        Get axial slice at given z index, windowed to uint8 for display
+
+        The volume holds rescaled values, so the window is in the same units
+        (e.g. HU). The returned array is the view's display buffer and is
+        overwritten by the next call for the same view.
+        """
+        return self._windowed('axial', self.get_axial_slice(z_index), window_center, window_width)
+
+    def get_coronal_slice_windowed(self, y_index: int, window_center: float,
+                                   window_width: float) -> Optional[np.ndarray]:
+        """Get coronal slice at given y index, windowed to uint8 (see get_axial_slice_windowed)"""
+        return self._windowed('coronal', self.get_coronal_slice(y_index), window_center, window_width)
+
+    def get_sagittal_slice_windowed(self, x_index: int, window_center: float,
+                                    window_width: float) -> Optional[np.ndarray]:
+        """Get sagittal slice at given x index, windowed to uint8 (see get_axial_slice_windowed)"""
+        return self._windowed('sagittal', self.get_sagittal_slice(x_index), window_center, window_width)
+
     def get_oblique_slice(self, point: Tuple[float, float, float],
                          normal: Tuple[float, float, float],
                          size: Tuple[int, int] = (256, 256)) -> np.ndarray:
         """
         Get oblique slice through the volume
 
+        The slice is sampled one voxel apart with trilinear interpolation
+        (by a compiled kernel when numba is available). An axial normal
+        (0, 0, 1) gives the orientation of get_axial_slice; otherwise the
+        columns run towards +x (towards +z for planes of constant x).
+
         Args:
-            point: Point on the slice plane
-            normal: Normal vector of the slice plane
-            size: Output slice size
+            point: Point on the slice plane, at the slice center, in (x, y, z)
+                   voxel coordinates
+            normal: Normal vector of the slice plane, (x, y, z)
+            size: Output slice size (rows, columns)
 
         Returns:
-            Oblique slice image
+            Oblique slice image; 0 outside the volume
         """
-        # This is a simplified implementation
-        # A complete implementation would use proper 3D interpolation
-        logger.warning("Oblique slicing not fully implemented")
-        return np.zeros(size, dtype=self.volume_data.dtype)
+        normal = np.asarray(normal, dtype=np.float64)
+        normal /= np.linalg.norm(normal)
+
+        # In-plane axes: an axial normal gives the axial slice orientation
+        helper = np.array([0.0, 1.0, 0.0]) if abs(normal[1]) < 0.9 else np.array([0.0, 0.0, -1.0])
+        u = np.cross(helper, normal)
+        if u[0] < 0 or (u[0] == 0 and u[2] < 0):
+            u = -u
+        u /= np.linalg.norm(u)
+        v = np.cross(normal, u)
+
+        rows, columns = size
+        origin = np.asarray(point, dtype=np.float64) - (columns - 1) / 2 * u - (rows - 1) / 2 * v
+
+        out = np.empty(size, dtype=self.volume_data.dtype)
+        if NUMBA_AVAILABLE:
+            return sample_plane(self.volume_data, origin, u, v, out)
+
+        i, j = np.mgrid[0:rows, 0:columns]
+        coordinates = [origin[axis] + j * u[axis] + i * v[axis] for axis in (2, 1, 0)]
+        return ndimage.map_coordinates(self.volume_data, coordinates, output=out,
+                                       order=1, mode='constant', cval=0)
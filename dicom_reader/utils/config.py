@@ -19,6 +19,7 @@ class Config:
     APP_DIR = HOME_DIR / ".dicom_reader"
     DATABASE_PATH = APP_DIR / "dicom_database.db"
     LOG_DIR = APP_DIR / "logs"
+    VOLUME_CACHE_DIR = APP_DIR / "volume_cache"
 
     # Ensure directories exist
     @classmethod
@@ -36,6 +37,9 @@ class Config:
     MIN_CINE_FPS = 1
     MAX_CINE_FPS = 60
 
+    # 3D reconstruction settings
+    VOLUME_CACHE_MAX_BYTES = 4 * 1024 ** 3  # Oldest cached volumes are deleted beyond this
+
     # Database settings
     DB_ECHO = False  # Set to True for SQL debugging
 
@@ -46,7 +50,3 @@ class Config:
     # UI settings
     MAIN_WINDOW_WIDTH = 1400
     MAIN_WINDOW_HEIGHT = 900
-
-
-# Ensure directories are created on import
-Config.ensure_directories()
@@ -4,8 +4,11 @@ DICOM Reader - Main Entry Point
 A comprehensive DICOM file viewer with advanced features
 """
 
+import atexit
 import sys
 import logging
+import logging.handlers
+import queue
 from PyQt5.QtWidgets import QApplication
 
 from dicom_reader.gui import MainWindow
@@ -16,14 +19,24 @@ def setup_logging():
     """Configure logging for the application"""
     log_file = Config.LOG_DIR / "dicom_reader.log"
 
-    logging.basicConfig(
-        level=getattr(logging, Config.LOG_LEVEL),
-        format=Config.LOG_FORMAT,
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    formatter = logging.Formatter(Config.LOG_FORMAT)
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler(sys.stdout)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Loggers only put records on a queue; the file and console are written
+    # by the listener's thread, so logging never waits for disk I/O
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Replaces any handlers set up on import (e.g. by a basicConfig call)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(getattr(logging, Config.LOG_LEVEL))
 
     logger = logging.getLogger(__name__)
     logger.info(f"Starting {Config.APP_NAME} v{Config.APP_VERSION}")
@@ -32,6 +45,9 @@ def setup_logging():
 
 def main():
     """Main application entry point"""
+    # Create the application and log directories
+    Config.ensure_directories()
+
     # Setup logging
     setup_logging()
 